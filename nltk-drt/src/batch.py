@@ -0,0 +1,153 @@
+"""
+Parsing of whole corpora of discourses with a pool of worker processes
+"""
+__author__ = "Alex Kislev, Emma Li, Peter Makarov"
+__version__ = "1.0"
+__date__ = "Tue, 24 Aug 2010"
+
+import sys
+import json
+import argparse
+import multiprocessing
+from collections import deque, OrderedDict
+from presuppdrt import VariableAllocator, DiscourseBuilder
+from util import Tester
+
+GRAMMAR = 'file:../data/grammar.fcfg'
+
+# the tester of a worker process, made once by _init_worker
+_tester = None
+
+def _init_worker(grammar, drt_parser, namespaces):
+    global _tester
+    # every worker gets a namespace of its own, so that the unique variables
+    # of sentences parsed by different workers never collide
+    with namespaces.get_lock():
+        namespaces.value += 1
+        namespace = namespaces.value
+    _tester = Tester(grammar, drt_parser, allocator=VariableAllocator(namespace))
+
+def _error(e, text):
+    return "%s: %s -- %s" % (e.__class__.__name__, text, e)
+
+def _parse_sentence(sentence):
+    return _parse_with(_tester, sentence)
+
+def _parse_with(tester, sentence):
+    try:
+        return tester.parse_sentence(sentence), None
+    except Exception as e:
+        return None, _error(e, sentence)
+
+class _Done(object):
+    """The result of a sentence parsed in this process, in place of an C{AsyncResult}"""
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+def _assemble(logic_parser, text, results):
+    """Put the DRSs of the sentences of a discourse together, like L{Tester.parse}"""
+    discourse = DiscourseBuilder(logic_parser.parse('DRS([n],[])'))
+    for sentence, result in zip(Tester.sentences(text), results):
+        try:
+            drs, error = result.get()
+        except Exception as e:
+            # the worker failed outside of the parse, e.g. its result could not be
+            # pickled, or it died: only this discourse is lost, not the batch
+            return text, None, _error(e, sentence)
+        if error:
+            return text, None, error
+        try:
+            discourse.append(drs)
+        except Exception as e:
+            return text, None, _error(e, sentence)
+    try:
+        return text, discourse.drs(), None
+    except Exception as e:
+        return text, None, _error(e, text)
+
+def parse_batch(discourses, drt_parser, grammar=GRAMMAR, processes=None, window=64):
+    """
+    Parse discourses with a pool of processes. Every sentence is a task of
+    its own, and the DRSs of the sentences of a discourse are put together
+    in order as soon as they are all done. Discourses are read from the
+    input only as far as C{window} of them are in flight, so that corpora
+    of any size run in bounded memory.
+    @param discourses: iterable of C{str}
+    @param drt_parser: C{DrtParser} class for the semantics of the grammar
+    @param grammar: C{str} URL of the grammar
+    @param processes: C{int} the number of worker processes, by default one
+    per CPU, 0 parses in this process
+    @param window: C{int} the number of discourses in flight at most
+    @return: iterator over tuples of the discourse, its DRS and an error
+    message, in the order of the input; either the DRS or the message is C{None}
+    """
+    assert window > 0, "The window must hold at least one discourse"
+    # the grammar is only loaded here if the sentences are parsed here
+    logic_parser = drt_parser()
+    tester = None
+    pool = None
+    if processes != 0:
+        namespaces = multiprocessing.Value('i', 0)
+        pool = multiprocessing.Pool(processes, _init_worker, (grammar, drt_parser, namespaces))
+    else:
+        tester = Tester(grammar, drt_parser)
+    pending = deque()
+    try:
+        for text in discourses:
+            if pool:
+                results = [pool.apply_async(_parse_sentence, (sentence,)) for sentence in Tester.sentences(text)]
+            else:
+                results = [_Done(_parse_with(tester, sentence)) for sentence in Tester.sentences(text)]
+            pending.append((text, results))
+            if len(pending) >= window:
+                yield _assemble(logic_parser, *pending.popleft())
+        while pending:
+            yield _assemble(logic_parser, *pending.popleft())
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+def write_jsonl(results, stream):
+    """
+    Write the results of L{parse_batch} as one JSON object per line, with
+    the number of the discourse, its text and either its DRS or the error.
+    """
+    for number, (text, drs, error) in enumerate(results):
+        record = OrderedDict([('id', number), ('text', text)])
+        if error:
+            record['error'] = error
+        else:
+            record['drs'] = str(drs)
+        stream.write(json.dumps(record) + '\n')
+        stream.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse a file of discourses, one per line, into JSON lines")
+    parser.add_argument('input', nargs='?', default='-', help="file of discourses, - for the standard input")
+    parser.add_argument('-o', '--output', default='-', help="file to write to, - for the standard output")
+    parser.add_argument('-g', '--grammar', default=GRAMMAR, help="URL of the grammar")
+    parser.add_argument('-l', '--logic', default='temporaldrt', choices=['presuppdrt', 'temporaldrt', 'wntemporaldrt'],
+                        help="module of the DRT parser")
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help="number of worker processes, by default one per CPU, 0 parses in this process")
+    parser.add_argument('-w', '--window', type=int, default=64, help="number of discourses in flight at most")
+    args = parser.parse_args(argv)
+
+    drt_parser = __import__(args.logic).DrtParser
+    input = sys.stdin if args.input == '-' else open(args.input)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        discourses = (line.strip() for line in input if line.strip())
+        write_jsonl(parse_batch(discourses, drt_parser, args.grammar, args.processes, args.window), output)
+    finally:
+        if input is not sys.stdin:
+            input.close()
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""
+Benchmarks for the temporaldrt module
+"""
+__author__ = "Alex Kislev, Emma Li, Peter Makarov"
+__version__ = "1.0"
+__date__ = "Tue, 24 Aug 2010"
+
+import re
+import time
+from types import LambdaType
+from nltk import load_parser
+from nltk.sem.logic import LogicParser, Variable, Expression, LambdaExpression
+from presuppdrt import AbstractDrs, DrtApplicationExpression, DrtFeatureExpression, DrtVariableExpression, DrtIndividualVariableExpression, DrtFunctionVariableExpression, \
+    DrtEventVariableExpression, DrtStateVariableExpression, DrtUtterVariableExpression, DrtTimeVariableExpression, \
+    DrtConstantExpression, intern_variable, variable_kind, transform
+from temporaldrt import DrtParser
+from util import Tokenizer, Tester
+import test
+
+REPEAT = 5
+
+def best_time(function, *args):
+    """Return the best of L{REPEAT} timings of function(*args) in seconds"""
+    best = None
+    for _ in range(REPEAT):
+        start = time.time()
+        function(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def report(name, reference, current):
+    print "%-40s %8.2f ms %8.2f ms %6.1fx" % (name, reference * 1000, current * 1000, reference / current)
+
+# names as they occur in the readings: referents, fresh variables, predicates and features
+NAMES = ['x', 'y', 'z17', 'e', 'e034', 's', 's012', 't', 't045', 'n', 'P', 'F3',
+         'John', 'car', 'AGENT', 'PATIENT', 'overlap', 'earlier', 'sg', 'm'] * 50
+
+DRSS = [
+    "([n,t,e,x,y],[earlier(t,n), John{sg,m}(x), Mary{sg,f}(y), love(e), AGENT(e,x), PATIENT(e,y), include(t,e)])",
+    "([n,x],[(([z74,s],[car{sg,n}(z74), own(s), AGENT(s,x), PATIENT(s,z74), overlap(n,s)]) -> ([s079],[rich(s079), THEME(s079,x), overlap(n,s079), overlap(s,s079)])), John{sg,m}(x)])",
+    "([n,t,s,t072,s070,x,y],[earlier(t,n), John{sg,m}(x), away(s), THEME(s,x), overlap(t,s), earlier(t072,n), POSS(y,x), car{sg,n}(y), broken(s070), THEME(s070,y), overlap(t072,s070), overlap(s,s070)])",
+    ] * 10
+
+def _matching_variable_kind(name):
+    """Classify a name the way it was done before, matching the patterns on every call"""
+    return (re.match(r'^[a-df-mo-ru-z]\d*$', name) or re.match(r'^[A-Z]\d*$', name) or
+            re.match(r'^e\d*$', name) or re.match(r'^s\d*$', name) or
+            re.match(r'^n\d*$', name) or re.match(r'^[tn]\d*$', name))
+
+def bench_variable_kinds():
+    # the names of the readings are those of interned variables, which keep their kinds
+    variables = [intern_variable(name) for name in NAMES]
+    def run(classify):
+        for name in NAMES:
+            classify(name)
+    report("variable kinds (%s)" % len(NAMES), best_time(run, _matching_variable_kind), best_time(run, variable_kind))
+
+def _matching_variable_expression(variable):
+    """The variable expression factory as it was, matching the patterns on every call"""
+    name = variable.name
+    if re.match(r'^[a-df-mo-ru-z]\d*$', name):
+        return DrtIndividualVariableExpression(variable)
+    elif re.match(r'^[A-Z]\d*$', name):
+        return DrtFunctionVariableExpression(variable)
+    elif re.match(r'^e\d*$', name):
+        return DrtEventVariableExpression(variable)
+    elif re.match(r'^s\d*$', name):
+        return DrtStateVariableExpression(variable)
+    elif re.match(r'^n\d*$', name):
+        return DrtUtterVariableExpression(variable)
+    elif re.match(r'^[tn]\d*$', name):
+        return DrtTimeVariableExpression(variable)
+    else:
+        return DrtConstantExpression(variable)
+
+def bench_variable_expressions():
+    variables = [intern_variable(name) for name in NAMES]
+    def run(factory):
+        for variable in variables:
+            factory(variable)
+    report("variable expressions (%s)" % len(variables),
+           best_time(run, _matching_variable_expression), best_time(run, DrtVariableExpression))
+
+def bench_parse_drs():
+    parser = DrtParser()
+    def run(make_VariableExpression):
+        parser.make_VariableExpression = make_VariableExpression
+        for drs in DRSS:
+            parser.parse(drs)
+    matching = lambda name: _matching_variable_expression(intern_variable(name))
+    reference = best_time(run, matching)
+    current = best_time(run, DrtParser.make_VariableExpression.__get__(parser))
+    report("parse DRS strings (%s)" % len(DRSS), reference, current)
+
+SENTENCES = [
+    "Mary kissed John, he smiled",
+    "Jones's wife has not bought someone's car",
+    "If Mary does not like the president, she will not vote him",
+    "Every farmer who owns a donkey wrote everything he wanted",
+    "Angus bit the dog and died",
+    ] * 40
+
+_WORD_SPLIT = re.compile(" |, |,")
+_EXCLUDED_NEXT = re.compile("^ha[sd]|is|was|not|will$")
+_EXCLUDED = re.compile("^does|h?is|red|[a-z]+ness$")
+_SUBSTITUTIONS = [
+ (re.compile("^died$"), ("did", "die")),
+ (re.compile("^([A-Z][a-z]+)'s?$"), lambda m: (m.group(1), "s")),
+ (re.compile("^(?P<stem>[a-z]+)s$"), lambda m: ("does", m.group("stem"))),
+ (re.compile("^([a-z]+(?:[^cvklt]|lk|nt))ed|([a-z]+[cvlkt]e)d$"), lambda m: ("did", m.group(1) if m.group(1) else m.group(2))),
+ (re.compile("^([A-Z]?[a-z]+)one$"), lambda m: (m.group(1), "one")),
+ (re.compile("^([A-Z]?[a-z]+)thing$"), lambda m: (m.group(1), "thing")),
+ (re.compile("^bit$"), ("did", "bite")),
+ (re.compile("^bought$"), ("did", "buy")),
+ (re.compile("^wrote$"), ("did", "write")),
+]
+
+def _matching_split(sentence):
+    """Split a sentence the way it was done before, trying the patterns one after another"""
+    words = []
+    exlude_next = False
+    for word in _WORD_SPLIT.split(sentence):
+        match = None
+        if _EXCLUDED_NEXT.match(word):
+            exlude_next = True
+            words.append(word)
+            continue
+        if exlude_next or _EXCLUDED.match(word):
+            exlude_next = False
+            words.append(word)
+            continue
+        for pattern, replacement in _SUBSTITUTIONS:
+            match = pattern.match(word)
+            if match:
+                if isinstance(replacement, LambdaType):
+                    words.extend(replacement(match))
+                else:
+                    words.extend(replacement)
+                break
+        if not match:
+            words.append(word)
+    return words
+
+def bench_split():
+    tokenizer = Tokenizer()
+    def run(split):
+        for sentence in SENTENCES:
+            split(sentence)
+    report("split sentences (%s)" % len(SENTENCES), best_time(run, _matching_split), best_time(run, tokenizer.split))
+
+class _RecordingParser(DrtParser):
+    """A parser that keeps the strings it is given"""
+    def __init__(self):
+        DrtParser.__init__(self)
+        self.strings = []
+
+    def parse(self, data, signature=None):
+        self.strings.append(data)
+        return DrtParser.parse(self, data, signature)
+
+class _ExpectationTester(object):
+    """Stands in for the tester of the test suite and keeps the expected DRSs"""
+    def __init__(self):
+        self.strings = []
+
+    def test(self, cases, **args):
+        for number, sentence, expected in cases:
+            if expected:
+                self.strings.extend(expected if isinstance(expected, list) else [expected])
+
+    def inference_test(self, cases, bk, **args):
+        pass
+
+def bench_parse_semantics():
+    recorder = _RecordingParser()
+    load_parser('file:../data/grammar.fcfg', logic_parser=recorder, cache=False)
+    tester = _ExpectationTester()
+    for header, suite in test.TESTS:
+        suite(tester)
+    parser = DrtParser()
+    def run(parse, strings):
+        for string in strings:
+            parse(string)
+    generic = lambda string: LogicParser.parse(parser, string)
+    for name, strings in [("grammar SEM strings", recorder.strings), ("test expectations", tester.strings)]:
+        report("parse %s (%s)" % (name, len(strings)), best_time(run, generic, strings), best_time(run, parser.parse, strings))
+
+# sentences the grammar covers, whose semantics are put together in the chart
+COMPOSED = ["Jones loves Charlotte and Bill loves her", "He hates himself", "If Jones is away, he has left London",
+            "Every farmer who owns a donkey likes it", "Mary does not like John's car"]
+
+def _replacing_substitute_bindings(expression, bindings):
+    """Substitute bindings the way it was done before, replacing one variable after another"""
+    expr = expression
+    for var in expr.variables():
+        val = bindings.get(var, None)
+        if val:
+            if isinstance(val, Variable):
+                val = DrtVariableExpression(val)
+            elif isinstance(val, AbstractDrs):
+                val = _replacing_substitute_bindings(val, bindings)
+            elif isinstance(val, Expression):
+                val = val.substitute_bindings(bindings)
+            else:
+                val = DrtFeatureExpression(Variable(val))
+            expr = expr.replace(var, val)
+    return expr.simplify()
+
+def bench_substitute_bindings():
+    tester = Tester('file:../data/grammar.fcfg', DrtParser, cache_size=0)
+    calls = []
+    substitute_bindings = AbstractDrs.substitute_bindings
+    def recording(self, bindings):
+        calls.append((self, dict(bindings)))
+        return substitute_bindings(self, bindings)
+    AbstractDrs.substitute_bindings = recording
+    try:
+        for sentence in COMPOSED:
+            tester.trees(tester._split(sentence), 1)
+    finally:
+        AbstractDrs.substitute_bindings = substitute_bindings
+    def run(substitute):
+        for expression, bindings in calls:
+            substitute(expression, bindings)
+    report("substitute bindings (%s)" % len(calls), best_time(run, _replacing_substitute_bindings),
+           best_time(run, substitute_bindings))
+
+def bench_prune_grammar():
+    def run(tester):
+        for sentence in COMPOSED:
+            tester.trees(tester._split(sentence), 1)
+    whole = Tester('file:../data/grammar.fcfg', DrtParser, cache_size=0)
+    pruned = Tester('file:../data/grammar.fcfg', DrtParser, cache_size=0, prune=True)
+    report("parse sentences (%s)" % len(COMPOSED), best_time(run, whole), best_time(run, pruned))
+
+class _FreeAtEveryBinder(object):
+    """
+    Stands in for the free variables of the expressions put in, that
+    substitute() works out once, and works them out again whenever a binder
+    looks at them, the way it was done before
+    """
+    def __init__(self, mapping):
+        self.mapping = mapping
+
+    def keys(self):
+        return self.mapping.keys()
+
+    def __getitem__(self, variable):
+        return self.mapping[variable].free()
+
+    def iteritems(self):
+        for variable, expression in self.mapping.iteritems():
+            yield variable, expression.free()
+
+def _binderwise_substitute(self, mapping, replace_bound=False):
+    """AbstractDrs.substitute as it was, looking for the free variables of the expressions at every binder"""
+    if not mapping:
+        return self
+    return transform(self, "_substitute", "_substituted",
+                     (mapping, frozenset(mapping) if replace_bound else frozenset(), _FreeAtEveryBinder(mapping)))
+
+def _rebuilding_simplify(self, parts):
+    """DrtApplicationExpression._simplify as it was, building every application again and simplifying every reduction again"""
+    function, argument = parts
+    if isinstance(function, LambdaExpression):
+        return function.term.replace(function.variable, argument).simplify()
+    return self.__class__(function, argument)
+
+def bench_beta_reduction():
+    tester = Tester('file:../data/grammar.fcfg', DrtParser, cache_size=0)
+    simplify = DrtApplicationExpression.simplify
+    # the applications that are simplified in putting the meanings of the sentences together
+    applications = []
+    def recording(self):
+        applications.append(self)
+        DrtApplicationExpression.simplify = simplify
+        try:
+            return simplify(self)
+        finally:
+            DrtApplicationExpression.simplify = recording
+    DrtApplicationExpression.simplify = recording
+    try:
+        for sentence in COMPOSED:
+            tester.trees(tester._split(sentence), 1)
+    finally:
+        DrtApplicationExpression.simplify = simplify
+    def run():
+        for application in applications:
+            application.simplify()
+    current = best_time(run)
+    substitute = AbstractDrs.substitute
+    reduction = DrtApplicationExpression._simplify
+    AbstractDrs.substitute = _binderwise_substitute
+    DrtApplicationExpression._simplify = _rebuilding_simplify
+    try:
+        reference = best_time(run)
+    finally:
+        AbstractDrs.substitute = substitute
+        DrtApplicationExpression._simplify = reduction
+    report("beta reduction (%s)" % len(applications), reference, current)
+
+BENCHMARKS = [("Variable kinds", [bench_variable_kinds, bench_variable_expressions, bench_parse_drs]),
+              ("Tokenizer", [bench_split]),
+              ("DRS parser", [bench_parse_semantics]),
+              ("Lexical semantics", [bench_substitute_bindings, bench_beta_reduction]),
+              ("Grammar pruning", [bench_prune_grammar]),
+              ]
+
+def main():
+    print "%-40s %11s %11s %7s" % ("", "before", "after", "")
+    for header, benchmarks in BENCHMARKS:
+        print "\n%s" % header
+        for benchmark in benchmarks:
+            benchmark()
+
+if __name__ == '__main__':
+    main()
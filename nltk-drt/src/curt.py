@@ -10,6 +10,7 @@ import random
 from test import BK
 from util import Tester, UngrammaticalException
 from temporaldrt import DrtParser
+from presuppdrt import DiscourseBuilder
 from inference import AdmissibilityError, ConsistencyError, InformativityError
 
 class Curt(object):
@@ -18,10 +19,11 @@ class Curt(object):
     UNINFORMATIVE = ["I know that already!", "Whatever!", "You ain't seen nothing yet!", "Hey, that's an oldie.", "Betcha don't know.", "It's all one to me "]
     OK = ["Nice to know", "OK", "Go on!", "Go ahead!", "No problem!", "Do your thing!", "No kiddin'?", "Really?", "Is that so?", "That's more like it", "What are you driving at?", "C'mon, shake a leg!", "Well, that's the way the cookie crumbles.", "Spill the beans!", "While you live, tell truth and shame the Devil!"]
     GOODBYE = ["See ya!", "Nice talking to you!", "Bye!", "Take care!", "Cheers!", "So long and thanks for all the fish!"]
-    def __init__(self, grammar_file='file:../data/grammar.fcfg', logic_parser=DrtParser, background=None):
-        self.tester = Tester(grammar_file, logic_parser)
+    def __init__(self, grammar_file='file:../data/grammar.fcfg', logic_parser=DrtParser, background=None, allocator=None):
+        self.tester = Tester(grammar_file, logic_parser, allocator)
         self.background = background
         self.discourse = None
+        self.builder = None
         
     def randomize(self, option_list):
         return option_list[random.randint(0, len(option_list) - 1)]
@@ -52,6 +54,7 @@ class Curt(object):
     def process(self, utterance, explicit=False, verbose=False):
         if self.discourse is None:
             self.discourse = self.tester.parse(utterance, utter=True)
+            self.builder = DiscourseBuilder(self.discourse)
         else:
             expression = self.tester.parse_new(self.discourse, utterance)
             inferences, errors = self.tester.interpret_new(self.discourse, expression, background=self.background)
@@ -66,7 +69,9 @@ class Curt(object):
                 if verbose:
                     for inference in inferences:
                         print "reading: %s" % inference
-                self.discourse = (self.discourse + expression).simplify()
+                with self.tester.allocation():
+                    self.builder.append(expression)
+                self.discourse = self.builder.drs()
 
         return self.ok()
         
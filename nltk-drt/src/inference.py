@@ -244,6 +244,67 @@ class Theorem(object):
 
         return (result, output)
 
+def _sub_drss(cond):
+    """Return the DRSs directly embedded in a condition"""
+    if isinstance(cond, DRS):
+        return (cond,)
+    elif isinstance(cond, DrtNegatedExpression) and \
+        isinstance(cond.term, DRS):
+        return (cond.term,)
+    elif isinstance(cond, DrtBooleanExpression) and \
+        isinstance(cond.first, DRS) and isinstance(cond.second, DRS):
+        return (cond.first, cond.second)
+    return ()
+
+def _remove_temporal_conds(e):
+    """Removes discourse structuring temporal conditions that could
+    affect inference check"""
+    stack = [e]
+    while stack:
+        drs = stack.pop()
+        for cond in list(drs.conds):
+            if isinstance(cond, DrtEventualityApplicationExpression) and \
+            isinstance(cond.function, DrtEventualityApplicationExpression) and \
+            cond.function.function.variable.name in DrtTokens.TEMP_CONDS:
+                drs.conds.remove(cond)
+            else:
+                stack.extend(_sub_drss(cond))
+        drs.invalidate()
+
+def _check(expression, background_knowledge=False, verbose=False):
+    """method performing check"""
+    if background_knowledge:
+        e = AndExpression(expression.fol(), background_knowledge)
+        if verbose:
+            print "performing check on: %s" % e
+        t = Theorem(NegatedExpression(e), e)
+    else:
+        if verbose:
+            print "performing check on: %s" % expression.fol()
+        t = Theorem(NegatedExpression(expression), expression)
+    
+    result, output = t.check()
+    if verbose:
+        if output:
+            print "\nMace4 returns:\n%s\n" % output
+        else:
+            print "\nProver9 returns: %s\n" % (not result)
+    return result      
+
+def consistency_check(expr, background_knowledge=False, verbose=False):
+    """Consistency check alone, e.g. for partially resolved readings:
+    an inconsistent expression stays inconsistent whatever is added to it"""
+    
+    assert isinstance(expr, DRS), "Expression %s is not a DRS" % expr
+
+    expression = expr.deepcopy()
+    _remove_temporal_conds(expression)
+    if verbose:
+        print "\n##### Consistency check of a partial reading #####\n\nExpression:\t%s\n" % expression
+    if expression.conds and not _check(expression, background_knowledge, verbose):
+        return False, ConsistencyError("Discourse is inconsistent on the following partial interpretation:\n\n%s" % expression)
+    return True, None
+
 def inference_check(expr, background_knowledge=False, verbose=False):
     """General function for all kinds of inference-based checks:
     consistency, global and local informativity"""
@@ -254,52 +315,11 @@ def inference_check(expr, background_knowledge=False, verbose=False):
     if verbose:
         print "\n##### Inference check initiated #####\n\nExpression:\t%s\n" % expression
     
-    def _remove_temporal_conds(e):
-        """Removes discourse structuring temporal conditions that could
-        affect inference check"""
-        for cond in list(e.conds):
-            if isinstance(cond, DrtEventualityApplicationExpression) and \
-            isinstance(cond.function, DrtEventualityApplicationExpression) and \
-            cond.function.function.variable.name in DrtTokens.TEMP_CONDS:
-                e.conds.remove(cond)
-                
-            elif isinstance(cond, DRS):
-                _remove_temporal_conds(cond)
-                
-            elif isinstance(cond, DrtNegatedExpression) and \
-                isinstance(cond.term, DRS):
-                _remove_temporal_conds(cond.term)
-                
-            elif isinstance(cond, DrtBooleanExpression) and \
-                isinstance(cond.first, DRS) and isinstance(cond.second, DRS): 
-                _remove_temporal_conds(cond.first)
-                _remove_temporal_conds(cond.second)           
-
-    def _check(expression):
-        """method performing check"""
-        if background_knowledge:
-            e = AndExpression(expression.fol(), background_knowledge)
-            if verbose:
-                print "performing check on: %s" % e
-            t = Theorem(NegatedExpression(e), e)
-        else:
-            if verbose:
-                print "performing check on: %s" % expression.fol()
-            t = Theorem(NegatedExpression(expression), expression)
-        
-        result, output = t.check()
-        if verbose:
-            if output:
-                print "\nMace4 returns:\n%s\n" % output
-            else:
-                print "\nProver9 returns: %s\n" % (not result)
-        return result      
-    
-    def consistency_check(expression):
+    def check_consistency(expression):
         """1. Consistency check"""
         if verbose:
             print "### Consistency check initiated...\n"
-        if not _check(expression):
+        if not _check(expression, background_knowledge, verbose):
             error_message = "New discourse is inconsistent on the following interpretation:\n\n%s" % expression
             if verbose:
                 print "#!!!#: %s" % error_message
@@ -326,7 +346,7 @@ def inference_check(expr, background_knowledge=False, verbose=False):
                 if verbose:
                     print "new discourse %s found in %s \n" % (cond, expression)
                     print "expression for global check: %s \n" % e
-                if not _check(e):
+                if not _check(e, background_knowledge, verbose):
                     #new discourse is uninformative
                     error_message = ("New expression is uninformative on the following interpretation:\n\n%s"
                                                                 % expression)
@@ -372,13 +392,13 @@ def inference_check(expr, background_knowledge=False, verbose=False):
             assert isinstance(main, DRS), "Expression %s is not a DRS"
             assert isinstance(sub, DRS), "Expression %s is not a DRS"
 
-            if not _check(main.__class__(main.refs, main.conds + [DrtNegatedExpression(sub)])):
+            if not _check(main.__class__(main.refs, main.conds + [DrtNegatedExpression(sub)]), background_knowledge, verbose):
                 error_message = "New discourse is inadmissible due to local uninformativity:\n\n%s entails %s" % (main, sub)
                 if verbose:
                     print "#!!!#: ", error_message
                 return AdmissibilityError(error_message)
                 
-            elif not _check(main.__class__(main.refs, main.conds + [sub])):
+            elif not _check(main.__class__(main.refs, main.conds + [sub]), background_knowledge, verbose):
                 error_message = "New discourse is inadmissible due to local uninformativity:\n\n%s entails the negation of %s" % (main, sub)
                 if verbose:
                     print "#!!!#: ", error_message
@@ -390,7 +410,7 @@ def inference_check(expr, background_knowledge=False, verbose=False):
     _remove_temporal_conds(expression)
     if verbose: print "Expression without eventuality-relating conditions: %s \n" % expression
     
-    cons_check = consistency_check(expression)
+    cons_check = check_consistency(expression)
     
     if cons_check is True:
         inf_check = informativity_check(expression)
@@ -435,31 +455,22 @@ def get_bk(drs, dictionary):
     assert isinstance(drs, DRS), "Expression %s is not a DRS" % drs
     assert isinstance(dictionary, dict), "%s is not a dictionary" % dictionary
     bk_list = []
-    
-    for cond in drs.conds:
-        if isinstance(cond, DrtApplicationExpression):
-            if isinstance(cond.function, DrtConstantExpression):
-                bk_formula = dictionary.get(cond.function.variable.name, False)
-               
-            elif isinstance(cond.function, DrtApplicationExpression) and \
-             isinstance(cond.function.function, DrtConstantExpression):
-                bk_formula = dictionary.get(cond.function.function.variable.name, False)
-               
-            if bk_formula:
-                bk_list.append(bk_formula)
-                
-        elif isinstance(cond, DRS):
-            bk_list.extend(get_bk(cond, dictionary))
-            
-        elif isinstance(cond, DrtNegatedExpression) and \
-            isinstance(cond.term, DRS):
-            bk_list.extend(get_bk(cond.term, dictionary))
-            
-        elif isinstance(cond, DrtBooleanExpression) and \
-            isinstance(cond.first, DRS) and isinstance(cond.second, DRS):
-            bk_list.extend(get_bk(cond.first, dictionary))
-            bk_list.extend(get_bk(cond.second, dictionary))
-            
+    stack = [drs]
+    while stack:
+        for cond in stack.pop().conds:
+            if isinstance(cond, DrtApplicationExpression):
+                bk_formula = False
+                if isinstance(cond.function, DrtConstantExpression):
+                    bk_formula = dictionary.get(cond.function.variable.name, False)
+                   
+                elif isinstance(cond.function, DrtApplicationExpression) and \
+                 isinstance(cond.function.function, DrtConstantExpression):
+                    bk_formula = dictionary.get(cond.function.function.variable.name, False)
+                   
+                if bk_formula:
+                    bk_list.append(bk_formula)
+            else:
+                stack.extend(_sub_drss(cond))
     
     return list(set(bk_list))
    
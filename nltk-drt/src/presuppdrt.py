@@ -8,11 +8,16 @@ __date__ = "Tue, 24 Aug 2010"
 
 import re
 import operator
+import threading
+import itertools
+from weakref import WeakValueDictionary
 
 from nltk.sem.logic import Variable
 from nltk.sem.logic import EqualityExpression, ApplicationExpression, ExistsExpression, AndExpression
-from nltk.sem.logic import IndividualVariableExpression
-from nltk.sem.logic import _counter, is_eventvar, is_funcvar
+from nltk.sem.logic import NegatedExpression, LambdaExpression, AllExpression, OrExpression, ImpExpression, IffExpression
+from nltk.sem.logic import IndividualVariableExpression, ConstantExpression
+from nltk.sem.logic import VariableBinderExpression, AbstractVariableExpression
+from nltk.sem.logic import _counter
 from nltk.sem.logic import BasicType
 from nltk.sem.logic import Expression
 from nltk.sem.logic import ParseException
@@ -45,6 +50,41 @@ class StateType(BasicType):
 
 STATE_TYPE = StateType()
 
+# The kinds of variables. A name can be of more than one kind: utterance
+# time variables are time variables too.
+INDIVIDUAL, FUNCTION, EVENT, TIME, STATE, UTTER = 1, 2, 4, 8, 16, 32
+
+_KIND_PATTERNS = [
+    (INDIVIDUAL, re.compile(r'^[a-df-mo-ru-z]\d*$')),
+    (FUNCTION, re.compile(r'^[A-Z]\d*$')),
+    (EVENT, re.compile(r'^e\d*$')),
+    (TIME, re.compile(r'^[tn]\d*$')),
+    (STATE, re.compile(r'^s\d*$')),
+    (UTTER, re.compile(r'^n\d*$')),
+    ]
+
+def variable_kind(name):
+    """
+    Return the kinds of variable the name stands for. The kinds of the name
+    of an interned variable (see L{intern_variable}) are kept on the variable,
+    so the patterns are only matched once for it and the kinds are dropped
+    along with it. Other names are matched every time.
+    
+    @param name: C{str}
+    @return: C{int} the combination of the flags of the kinds, 0 for a constant
+    """
+    variable = _variables.get(name)
+    try:
+        return variable.kind
+    except AttributeError:
+        kind = 0
+        for flag, pattern in _KIND_PATTERNS:
+            if pattern.match(name):
+                kind |= flag
+        if variable is not None:
+            variable.kind = kind
+        return kind
+
 def is_indvar(expr):
     """
     An individual variable must be a single lowercase character other than 'e', 't', 'n', 's',
@@ -54,7 +94,29 @@ def is_indvar(expr):
     @return: C{boolean} True if expr is of the correct form 
     """
     assert isinstance(expr, str), "%s is not a string" % expr
-    return re.match(r'^[a-df-mo-ru-z]\d*$', expr)
+    return bool(variable_kind(expr) & INDIVIDUAL)
+
+def is_funcvar(expr):
+    """
+    A function variable must be a single uppercase character followed by
+    zero or more digits.
+    
+    @param expr: C{str}
+    @return: C{boolean} True if expr is of the correct form 
+    """
+    assert isinstance(expr, str), "%s is not a string" % expr
+    return bool(variable_kind(expr) & FUNCTION)
+
+def is_eventvar(expr):
+    """
+    An event variable must be a single lowercase 'e' character followed by
+    zero or more digits.
+    
+    @param expr: C{str}
+    @return: C{boolean} True if expr is of the correct form 
+    """
+    assert isinstance(expr, str), "%s is not a string" % expr
+    return bool(variable_kind(expr) & EVENT)
 
 def is_timevar(expr):
     """
@@ -65,7 +127,7 @@ def is_timevar(expr):
     @return: C{boolean} True if expr is of the correct form 
     """
     assert isinstance(expr, str), "%s is not a string" % expr
-    return re.match(r'^[tn]\d*$', expr)
+    return bool(variable_kind(expr) & TIME)
 
 
 def is_statevar(expr):
@@ -77,7 +139,7 @@ def is_statevar(expr):
     @return: C{boolean} True if expr is of the correct form 
     """
     assert isinstance(expr, str), "%s is not a string" % expr
-    return re.match(r'^s\d*$', expr)
+    return bool(variable_kind(expr) & STATE)
 
 
 def is_uttervar(expr):
@@ -89,39 +151,131 @@ def is_uttervar(expr):
     @return: C{boolean} True if expr is of the correct form 
     """
     assert isinstance(expr, str), "%s is not a string" % expr
-    return re.match(r'^n\d*$', expr)
+    return bool(variable_kind(expr) & UTTER)
   
 
-def unique_variable(pattern=None, ignore=None):
+class VariableAllocator(object):
+    """
+    Gives out the numbers of unique variables. The global allocator draws
+    them from the counter NLTK uses for its own unique variables. Any other
+    allocator has a namespace and a counter of its own, so the names it gives
+    out only depend on the calls made to it, and allocators with different
+    namespaces never give out the same name, in whichever thread or process
+    they are used. Such a number is '0', the namespace written with the digits
+    1-9, '0' and the count, so that the name stays a valid name of its kind
+    and can not be given out by the global allocator, whose numbers never
+    start with '0'.
+
+    unique_variable() uses the allocator of the innermost C{with} block of
+    the current thread:
+
+        with VariableAllocator(1):
+            readings, errors = drs.resolve()
+    """
+    def __init__(self, namespace=None):
+        """
+        @param namespace: C{int} >= 0, or C{None} for the global allocator
+        """
+        assert namespace is None or (isinstance(namespace, int) and namespace >= 0), \
+            "%s is not a valid namespace" % namespace
+        self.namespace = namespace
+        self.count = 0
+        self._lock = threading.Lock()
+        if namespace is not None:
+            digits = []
+            while namespace > 0:
+                namespace, digit = divmod(namespace - 1, 9)
+                digits.append(str(digit + 1))
+            self._infix = '0' + ''.join(reversed(digits)) + '0'
+
+    def number(self):
+        """
+        Return a new number for a unique variable.
+        @return: C{str}
+        """
+        with self._lock:
+            if self.namespace is None:
+                return str(_counter.get())
+            self.count += 1
+            return self._infix + str(self.count)
+
+    def __enter__(self):
+        _allocation.__dict__.setdefault('allocators', []).append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _allocation.allocators.pop()
+
+_allocation = threading.local()
+
+GLOBAL_ALLOCATOR = VariableAllocator()
+
+def current_allocator():
+    """Return the allocator of the innermost C{with} block of the current
+    thread, see L{VariableAllocator}"""
+    allocators = getattr(_allocation, 'allocators', None)
+    return allocators[-1] if allocators else GLOBAL_ALLOCATOR
+
+# the namespaces of the allocators made by new_allocator(); those below are
+# left to be picked by hand, e.g. for the workers of batch
+_namespaces = itertools.count(1000)
+
+def new_allocator():
+    """Return an allocator with a namespace that no other allocator made by
+    this function in this process has, see L{VariableAllocator}"""
+    return VariableAllocator(next(_namespaces))
+
+def unique_variable(pattern=None, ignore=None, allocator=None):
     """
     Return a new, unique variable.
     param pattern: C{Variable} that is being replaced.  The new variable must
     be the same type.
     param term: a C{set} of C{Variable}s that should not be returned from 
     this function.
+    param allocator: C{VariableAllocator} to take the number from, by default
+    the L{current_allocator}
     return: C{Variable}
     """
     if pattern is not None:
-        if is_indvar(pattern.name):
+        kind = variable_kind(pattern.name)
+        if kind & INDIVIDUAL:
             prefix = 'z'
-        elif is_funcvar(pattern.name):
+        elif kind & FUNCTION:
             prefix = 'F'
-        elif is_eventvar(pattern.name):
+        elif kind & EVENT:
             prefix = 'e0'
-        elif is_timevar(pattern.name):
+        elif kind & TIME:
             prefix = 't0'
-        elif is_statevar(pattern.name):
+        elif kind & STATE:
             prefix = 's0'
         else:
             assert False, "Cannot generate a unique constant"
     else:
         prefix = 'z'
         
-    v = Variable(prefix + str(_counter.get()))
+    if allocator is None:
+        allocator = current_allocator()
+    v = intern_variable(prefix + allocator.number())
     while ignore is not None and v in ignore:
-        v = Variable(prefix + str(_counter.get()))
+        v = intern_variable(prefix + allocator.number())
     return v
 
+_variables = WeakValueDictionary()
+
+def intern_variable(name):
+    """
+    Return the shared C{Variable} with the given name. Variables are
+    immutable, so all the occurrences of a name in all the readings can
+    point to one object; it is dropped once no expression refers to it.
+    @param name: C{str}
+    @return: C{Variable}
+    """
+    try:
+        return _variables[name]
+    except KeyError:
+        variable = _variables[name] = Variable(name)
+        return variable
+
 class TimeVariableExpression(IndividualVariableExpression):
     """This class represents variables that take the form of a single lowercase
     'i' character followed by zero or more digits."""
@@ -132,6 +286,153 @@ class StateVariableExpression(IndividualVariableExpression):
     's' character followed by zero or more digits."""
     type = STATE_TYPE
 
+def fold(expression, combine, args=(), parts="children", leaves=False):
+    """
+    Combine the values of the subexpressions of an expression bottom-up
+    with an explicit stack, so that the depth of the expression is not
+    limited by the recursion limit.
+    @param expression: C{AbstractDrs}
+    @param combine: C{str} name of the method that returns the value of
+    an expression, given the list of the values of its parts and the args
+    @param args: C{tuple} of additional arguments of the combine method
+    @param parts: C{str} name of the method that returns the parts of an
+    expression, L{AbstractDrs.children} by default
+    @param leaves: C{boolean} if set, the leaf expressions (see
+    L{AbstractDrs.is_leaf}) are their own values and the combine method
+    is not called for them
+    @return: the value of the given expression
+    """
+    parts = operator.methodcaller(parts)
+    # the stack holds the expressions being visited, each with an iterator
+    # over its remaining parts and the values of the parts visited so far
+    stack = []
+    e, remaining, e_values = expression, iter(parts(expression)), []
+    while True:
+        for part in remaining:
+            if leaves and part.is_leaf:
+                e_values.append(part)
+                continue
+            part_parts = parts(part)
+            if part_parts:
+                stack.append((e, remaining, e_values))
+                e, remaining, e_values = part, iter(part_parts), []
+                break
+            e_values.append(getattr(part, combine)([], *args))
+        else:
+            value = getattr(e, combine)(e_values, *args)
+            if not stack:
+                return value
+            e, remaining, e_values = stack.pop()
+            e_values.append(value)
+
+def transform(expression, enter, leave, args=()):
+    """
+    Compute the value of an expression like L{fold}, for computations that
+    pass arguments of their own down to the parts of an expression, such as
+    the variables to replace.
+    @param expression: C{AbstractDrs}
+    @param enter: C{str} name of the method that is called with the args of
+    an expression and returns either its value and C{None}, or a state and
+    the list of the parts to visit, each with a C{tuple} of its own args
+    @param leave: C{str} name of the method that returns the value of an
+    expression, given its state and the list of the values of its parts
+    @param args: C{tuple} of the args of the given expression
+    @return: the value of the given expression
+    """
+    state, parts = getattr(expression, enter)(*args)
+    if parts is None:
+        return state
+    # the stack holds the expressions being visited, each with its state, an
+    # iterator over its remaining parts and the values of the parts visited so far
+    stack = []
+    e, remaining, e_values = expression, iter(parts), []
+    while True:
+        for part, part_args in remaining:
+            value, part_parts = getattr(part, enter)(*part_args)
+            if part_parts is None:
+                e_values.append(value)
+                continue
+            stack.append((e, state, remaining, e_values))
+            e, state, remaining, e_values = part, value, iter(part_parts), []
+            break
+        else:
+            value = getattr(e, leave)(state, e_values)
+            if not stack:
+                return value
+            e, state, remaining, e_values = stack.pop()
+            e_values.append(value)
+
+_walks = threading.local()
+
+# the undecorated methods walked() calls, by class and name
+_unwalked_methods = {}
+
+def _unwalked(cls, name):
+    try:
+        return _unwalked_methods[cls, name]
+    except KeyError:
+        method = getattr(cls, name).im_func
+        method = _unwalked_methods[cls, name] = getattr(method, 'unwalked', method)
+        return method
+
+def walked(method):
+    """
+    Decorate a recursive method of the expressions, so that it is computed
+    bottom-up with an explicit stack instead of recursing on the depth of the
+    expression. When the method is called on an expression, it is computed
+    for the subexpressions first (see L{AbstractDrs.children}), the deepest
+    first, and each value is kept until the method is called on that
+    subexpression with the same arguments. So the method must pass its own
+    arguments on to the children. Calls on other expressions, e.g. on one it
+    has just built, are walked in the same way.
+    """
+    name = method.__name__
+    defaults = method.func_defaults or ()
+    # the number of the arguments after self
+    count = method.func_code.co_argcount - 1
+
+    def walk(self, *args):
+        if len(args) < count:
+            # the kept values are looked up by the arguments, so the
+            # defaults are always passed on
+            args += defaults[len(defaults) - count + len(args):]
+        values = getattr(_walks, name, None)
+        if values is not None:
+            return _walk(self, name, args, values)
+        values = {}
+        setattr(_walks, name, values)
+        try:
+            return _walk(self, name, args, values)
+        finally:
+            delattr(_walks, name)
+
+    walk.__name__ = name
+    walk.__doc__ = method.__doc__
+    walk.unwalked = method
+    return walk
+
+def _walk(expression, name, args, values):
+    """Compute the method C{name} for an expression, see L{walked}"""
+    ids = tuple(id(arg) for arg in args)
+    # a value is kept with its expression, so that the id is not reused
+    kept = values.pop((id(expression),) + ids, None)
+    if kept is not None:
+        return kept[1]
+    # the stack holds the expressions being visited, each with an iterator
+    # over its remaining children
+    stack = [(expression, iter(expression.children()))]
+    while True:
+        for child in stack[-1][1]:
+            if child.children() and (id(child),) + ids not in values:
+                stack.append((child, iter(child.children())))
+                break
+        else:
+            e = stack.pop()[0]
+            value = _unwalked(e.__class__, name)(e, *args)
+            if not stack:
+                return value
+            values[(id(e),) + ids] = (e, value)
+
 def is_unary_predicate(expr):
     """check whether the given expression is an unary predicate"""
     return isinstance(expr, DrtApplicationExpression) and isinstance(expr.function, DrtAbstractVariableExpression)
@@ -171,8 +472,39 @@ class IntermediateAccommodation(Reading):
 class GlobalAccommodation(Reading): 
     pass
 
+class CombinedReading(Reading):
+    """
+    A reading that performs the readings of several independent
+    presuppositions at once. The positions the operations of each reading
+    refer to are relative to the original DRS, so they are shifted by the
+    number of conditions the preceding readings have added to or removed
+    from the same DRS.
+    """
+    def __init__(self, readings):
+        Reading.__init__(self, [operation for reading in readings for operation in reading])
+        self.readings = readings
+
+    def apply(self, drs, newdrs):
+        """Perform the operations on the copy C{newdrs} of C{drs}"""
+        shifts = []
+        for reading in self.readings:
+            reading_shifts = []
+            for target, function in reading:
+                if target is not drs:
+                    continue
+                position = function.position() if hasattr(function, 'position') else None
+                if position is None:
+                    newdrs = function(newdrs)
+                else:
+                    size = len(newdrs.conds)
+                    newdrs = function.shifted(sum(delta for anchor, delta in shifts if anchor < position))(newdrs)
+                    reading_shifts.append((position, len(newdrs.conds) - size))
+            shifts.extend(reading_shifts)
+        return newdrs
+
 class VariableReplacer(object):
     """A generic variable replacer functor to be used in readings"""
+    __slots__ = ('var', 'new_var', 'remove_ref')
     def __init__(self, var, new_var, remove_ref=True):
         self.var = var
         self.new_var = new_var
@@ -180,7 +512,10 @@ class VariableReplacer(object):
     def __call__(self, drs):
         if self.remove_ref:
             drs.refs.remove(self.var)
+            drs.invalidate()
         return drs.__class__(drs.refs, [cond.replace(self.var, self.new_var, False) for cond in drs.conds])
+    def variables(self):
+        return set([self.var, self.new_var.variable])
 
 class ConditionReplacer(object):
     """
@@ -188,6 +523,7 @@ class ConditionReplacer(object):
     replace the condition at the given index with any number of
     conditions, optionally adds a referent
     """
+    __slots__ = ('index', 'conds', 'ref')
     def __init__(self, index, conds, ref=None):
         self.index = index
         self.conds = conds
@@ -196,19 +532,147 @@ class ConditionReplacer(object):
         if self.ref:
             drs.refs.append(self.ref)
         drs.conds[self.index:self.index + 1] = self.conds
+        drs.invalidate()
         return drs
+    def position(self):
+        return self.index
+    def shifted(self, offset):
+        return ConditionReplacer(self.index + offset, self.conds, self.ref)
+    def variables(self):
+        return reduce(operator.or_, [cond.free() for cond in self.conds], set([self.ref]) if self.ref else set())
 
 class ConditionRemover(object):
     """A generic condition remover functor to be used in readings"""
+    __slots__ = ('cond_index',)
     def __init__(self, cond_index):
         self.cond_index = cond_index
     def __call__(self, drs):
         drs.conds.pop(self.cond_index)
+        drs.invalidate()
         return drs
+    def position(self):
+        return self.cond_index
+    def shifted(self, offset):
+        return ConditionRemover(self.cond_index + offset)
+    def variables(self):
+        return set()
 
 class ResolutionException(Exception):
     pass
 
+class AntecedentIndex(object):
+    """
+    Antecedent data of a single DRS: positions of the conditions that
+    can serve as antecedents, thematic roles and event participation.
+    It is built once per DRS and carried over to the copies of the DRS
+    that are not touched by the operations of a reading. It is valid as
+    long as the DRS has the generation it was built for, see
+    L{DRS.invalidate}.
+    """
+    __slots__ = ('generation', 'candidates', 'event_data', 'event_strings', 'individuals')
+
+    def __init__(self, drs, collect_event_data):
+        """
+        @param drs: C{DRS} to index
+        @param collect_event_data: C{function} that collects the event data
+        from a single condition, see L{PresuppositionDRS.collect_event_data}
+        """
+        self.generation = drs._generation
+        self.candidates = []
+        self.event_data = {}
+        self.event_strings = {}
+        self.individuals = {}
+        for position, cond in enumerate(drs.conds):
+            if not isinstance(cond, DrtApplicationExpression):
+                continue
+            if is_unary_predicate(cond) and cond.argument.__class__ is DrtIndividualVariableExpression:
+                self.candidates.append(position)
+            collect_event_data(cond, self.event_data, self.event_strings, self.individuals)
+
+    def is_valid(self, drs):
+        return self.generation == drs._generation
+
+    def position(self, drs, cond):
+        """Return the position of the given condition in the DRS or None"""
+        return drs._cached('positions', _positions, drs.conds).get(id(cond))
+
+    def merge(self, event_data_map, event_strings_map, individuals=None):
+        """Add the event data of the indexed DRS to the given maps"""
+        for variable, events in self.event_data.iteritems():
+            event_data_map.setdefault(variable, []).extend(events)
+        for argument, event_string in self.event_strings.iteritems():
+            assert argument not in event_strings_map
+            event_strings_map[argument] = event_string
+        if individuals is not None:
+            for variable, conds in self.individuals.iteritems():
+                individuals.setdefault(variable, []).extend(conds)
+
+def _positions(conds):
+    """Map the ids of the conditions to their first positions"""
+    positions = {}
+    for position, cond in enumerate(conds):
+        positions.setdefault(id(cond), position)
+    return positions
+
+class PendingItem(object):
+    """
+    An unresolved condition found by L{AbstractDrs.pending}, together with
+    its trail and its readings. A presupposition DRS that contains unresolved
+    conditions of its own is not ready: it has no readings yet.
+    """
+    __slots__ = ('cond', 'trail', 'readings', 'remove', 'error', '_footprint')
+
+    def __init__(self, cond, trail, readings=None, remove=False, error=None):
+        self.cond = cond
+        self.trail = trail
+        self.readings = readings
+        self.remove = remove
+        self.error = error
+        self._footprint = None
+
+    def is_ready(self):
+        return self.readings is not None
+
+    def is_presupposition(self):
+        return isinstance(self.cond, PresuppositionDRS)
+
+    def footprint(self):
+        """Return the set of variables that the readings of the condition
+        depend on or change, or None if they can not be told"""
+        if self._footprint is None:
+            if self.is_presupposition():
+                self._footprint = self.cond.footprint(self.trail)
+            else:
+                footprint = self.cond.free()
+                for reading in self.readings:
+                    for drs, function in reading:
+                        if not hasattr(function, 'variables'):
+                            return None
+                        footprint |= function.variables()
+                self._footprint = footprint
+        return self._footprint
+
+    def is_independent_of(self, other):
+        """
+        Two conditions are independent if resolving one of them changes
+        neither the readings of the other nor the DRSs they refer to, so
+        that they can be resolved in any order. Any two conditions that
+        are not presuppositions are assumed to depend on each other.
+        """
+        if not (self.is_ready() and other.is_ready()):
+            return False
+        if self.is_presupposition() and other.is_presupposition():
+            if self.cond.binds_any(other.cond.conds) or other.cond.binds_any(self.cond.conds):
+                return False
+        elif self.is_presupposition():
+            if not self.cond.is_atemporal():
+                return False
+        elif not (other.is_presupposition() and other.cond.is_atemporal()):
+            return False
+        footprint = self.footprint()
+        other_footprint = other.footprint()
+        return footprint is not None and other_footprint is not None and footprint.isdisjoint(other_footprint)
+
 class DrtTokens(drt.DrtTokens):
     OPEN_BRACE = '{'
     CLOSE_BRACE = '}'
@@ -224,11 +688,63 @@ class DrtTokens(drt.DrtTokens):
     REFLEXIVE_PRONOUN = 'RPRO'
     POSSESSIVE_PRONOUN = 'PPRO'
 
+class FolExpression(object):
+    """
+    A first order expression made by L{AbstractDrs.fol}. The translations of
+    large discourses are nested too deeply for the recursive printing of the
+    nltk classes, so they are printed with L{walked}.
+    """
+    def children(self):
+        if isinstance(self, ApplicationExpression):
+            return (self.function, self.argument)
+        elif isinstance(self, (NegatedExpression, VariableBinderExpression)):
+            return (self.term,)
+        return (self.first, self.second)
+
+    @walked
+    def str(self, syntax=DrtTokens.NLTK):
+        return super(FolExpression, self).str(syntax)
+
+class FolApplicationExpression(FolExpression, ApplicationExpression):
+    pass
+
+class FolNegatedExpression(FolExpression, NegatedExpression):
+    pass
+
+class FolLambdaExpression(FolExpression, LambdaExpression):
+    pass
+
+class FolExistsExpression(FolExpression, ExistsExpression):
+    pass
+
+class FolAllExpression(FolExpression, AllExpression):
+    pass
+
+class FolAndExpression(FolExpression, AndExpression):
+    pass
+
+class FolOrExpression(FolExpression, OrExpression):
+    pass
+
+class FolImpExpression(FolExpression, ImpExpression):
+    pass
+
+class FolIffExpression(FolExpression, IffExpression):
+    pass
+
+class FolEqualityExpression(FolExpression, EqualityExpression):
+    pass
+
 class AbstractDrs(drt.AbstractDrs):
     """
     A base abstract DRT Expression from which every DRT Expression inherits.
     """
 
+    # The attributes of the expressions are kept in slots. The nltk classes
+    # have no slots, so an expression can still get a __dict__, but it is
+    # only made for attributes that have no slot (e.g. those of the drawing code).
+    __slots__ = ('_template', '_alpha_hash')
+
     def applyto(self, other):
         return DrtApplicationExpression(self, other)
     
@@ -250,20 +766,215 @@ class AbstractDrs(drt.AbstractDrs):
     def __add__(self, other):
         return ConcatenationDRS(self, other)
     
+    @walked
+    def str(self, syntax=DrtTokens.NLTK):
+        # the nltk classes print the expression, the strings of the
+        # subexpressions are ready for them, see walked()
+        return super(AbstractDrs, self).str(syntax)
+
     def __deepcopy__(self, memo):
-        return self.deepcopy()
-    
+        copy = self.deepcopy()
+        # the copies share the template of the expression, so that the
+        # semantics of a production are compiled only once, when the first
+        # of them is instantiated
+        copy._template = self._shared_template()
+        return copy
+
+    def _shared_template(self):
+        try:
+            return self._template
+        except AttributeError:
+            template = self._template = SemanticsTemplate(self)
+            return template
+
+    def template(self):
+        """Return the L{SemanticsTemplate} of this expression, compiling it on the first call"""
+        template = self._shared_template()
+        template.compile()
+        return template
+
+    is_leaf = False
+    """Whether this is a variable or a constant expression"""
+
+    def children(self):
+        """Return the immediate subexpressions of this expression, see L{fold}"""
+        return ()
+
+    def deepcopy(self, operations=[]):
+        """This method returns a deep copy of the expression.
+        Optionally, it can take a list of lists of tuples (DRS, function) 
+        as an argument and generate a reading by performing 
+        a substitution in the DRS as specified by the function.
+        @param operations: a list of lists of tuples
+        """
+        return fold(self, "_copy", (operations,), leaves=True)
+
+    def _copy(self, children, operations):
+        """Return a copy of this expression with the given subexpressions,
+        see L{deepcopy}"""
+        return self.__class__(*children)
+
+    def fol(self):
+        return fold(self, "_fol", parts="_fol_parts")
+
+    def simplify(self):
+        return fold(self, "_simplify", parts="_simplify_parts", leaves=True)
+
+    def _simplify_parts(self):
+        """Return the subexpressions that are simplified before this expression"""
+        return self.children()
+
+    def _simplify(self, parts):
+        """Return this expression simplified, given its simplified L{_simplify_parts}"""
+        return self._copy(parts, [])
+
+    def free(self, indvar_only=True):
+        """@see: Expression.free()"""
+        return transform(self, "_free", "_join_free", (indvar_only,))
+
+    def _free(self, indvar_only):
+        """Return the state and the parts of this expression for L{free}, see L{transform}"""
+        args = (indvar_only,)
+        return indvar_only, [(child, args) for child in self.children()]
+
+    def _join_free(self, indvar_only, parts):
+        """Return the free variables of this expression, given those of its parts"""
+        return set().union(*parts)
+
+    def get_refs(self, recursive=False):
+        """@see: AbstractExpression.get_refs()"""
+        refs = []
+        stack = [self]
+        while stack:
+            own, parts = stack.pop()._ref_parts(recursive)
+            refs.extend(own)
+            stack.extend(reversed(parts))
+        return refs
+
+    def _ref_parts(self, recursive):
+        """Return the refs of this expression itself and the subexpressions
+        whose refs come after them, see L{get_refs}"""
+        return (), (self.children() if recursive else ())
+
+    def _fol_parts(self):
+        """Return the subexpressions whose first order translations L{_fol} needs"""
+        return self.children()
+
+    def _fol(self, parts):
+        """Return the first order translation of this expression, given the
+        translations of its L{_fol_parts}"""
+        raise NotImplementedError()
+
+    def __hash__(self):
+        """Expressions that only differ in the names of their bound referents
+        have the same hash, see L{_hash}. The hash is computed once, unless
+        there is a DRS in the expression: a DRS can be changed in place (see
+        L{DRS.invalidate}), which the expressions around it do not learn of."""
+        try:
+            value = self._alpha_hash
+        except AttributeError:
+            value = self._alpha_hash = None if self._has_drs() else self._hash({})
+        if value is None:
+            return self._hash({})
+        return value
+
+    def _has_drs(self):
+        """Whether there is a DRS among the subexpressions of this expression"""
+        stack = list(self.children())
+        while stack:
+            e = stack.pop()
+            if isinstance(e, DRS):
+                return True
+            stack.extend(e.children())
+        return False
+
+    def _hash(self, bound, level=0):
+        """
+        Return the hash of this expression, in which a variable bound by an
+        enclosing binder is hashed by the position of the binder and of the
+        variable in it rather than by its name. Equality short-circuits on
+        the hash, so what is hashed of the class must be what equality asks
+        of it: the nltk equality of most expressions accepts subclasses.
+        @param bound: C{dict} from C{Variable} to a C{tuple} of the level of
+        its binder and its position among the variables bound there
+        @param level: C{int} the number of binders around this expression
+        """
+        raise NotImplementedError()
+
+    def _bind(self, bound, variables, level):
+        """Return a copy of C{bound} with the variables bound at C{level}"""
+        bound = dict(bound)
+        for position, variable in enumerate(variables):
+            bound[variable] = (level, position)
+        return bound
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, AbstractDrs) and hash(self) != hash(other):
+            return False
+        return super(AbstractDrs, self).__eq__(other)
+
     def make_EqualityExpression(self, first, second):
         return DrtEqualityExpression(first, second)
 
     def make_VariableExpression(self, variable):
         return DrtVariableExpression(variable)
 
+    def substitute(self, mapping, replace_bound=False):
+        """
+        Replace every variable in the mapping with its expression in a single
+        traversal, instead of rebuilding the expression once per variable with
+        L{replace}. The replacements are simultaneous: the expressions that are
+        put in are not themselves subject to the other replacements.
+        @param mapping: C{dict} from C{Variable} to C{Expression}
+        @param replace_bound: C{boolean} Should bound variables be replaced?
+        """
+        if not mapping:
+            return self
+        # the free variables of every expression that is put in are looked
+        # for once, not at every binder; closed expressions are left out
+        free = {}
+        for variable, expression in mapping.iteritems():
+            variables = expression.free()
+            if variables:
+                free[variable] = variables
+        return transform(self, "_substitute", "_substituted",
+                         (mapping, frozenset(mapping) if replace_bound else frozenset(), free))
+
+    def replace(self, variable, expression, replace_bound=False):
+        """@see: Expression.replace()"""
+        assert isinstance(variable, Variable), "%s is not a Variable" % variable
+        assert isinstance(expression, Expression), "%s is not an Expression" % expression
+        return self.substitute({variable: expression}, replace_bound)
+
+    def _substitute(self, mapping, forced, free):
+        """
+        Return the state and the parts of this expression for L{substitute},
+        see L{transform}. The variables are replaced where they are free, and
+        those in C{forced} where they are bound, too.
+        @param mapping: C{dict} from C{Variable} to C{Expression}
+        @param forced: C{frozenset} of C{Variable}
+        @param free: C{dict} from C{Variable} to the C{set} of the free
+        variables of its expression, for the expressions that have any
+        """
+        if not mapping:
+            return self, None
+        args = (mapping, forced, free)
+        return None, [(child, args) for child in self.children()]
+
+    def _substituted(self, state, parts):
+        """Return this expression with the parts that L{substitute} made"""
+        return self.__class__(*parts)
+
+    # the names unique_variable() gives out
+    UNIQUE_VARIABLE = re.compile(r'^z\d+$|^[est]0\d+$')
+
     def normalize(self):
         """Rename auto-generated unique variables"""
         def f(e):
             if isinstance(e, Variable):
-                if re.match(r'^z\d+$', e.name) or re.match(r'^[est]0\d+$', e.name):
+                if AbstractDrs.UNIQUE_VARIABLE.match(e.name):
                     return set([e])
                 else:
                     return set([])
@@ -271,7 +982,7 @@ class AbstractDrs(drt.AbstractDrs):
                 combinator = lambda * parts: reduce(operator.or_, parts)
                 return e.visit(f, combinator, set())
         
-        result = self
+        mapping = {}
         for i, v in enumerate(sorted(list(f(self)))):
             if is_eventvar(v.name):
                 newVar = 'e0%s' % (i + 1)
@@ -281,13 +992,47 @@ class AbstractDrs(drt.AbstractDrs):
                 newVar = 's0%s' % (i + 1)
             else:
                 newVar = 'z%s' % (i + 1)
-            result = result.replace(v,
-                        self.make_VariableExpression(Variable(newVar)), True)
-        return result
+            mapping[v] = self.make_VariableExpression(intern_variable(newVar))
+        return self.substitute(mapping, True)
+
+    def canonical_key(self):
+        """
+        Return a key of this expression that is the same for all expressions
+        that only differ in the names of their bound referents and in the
+        order of the referents and of the conditions of their DRSs. Bound
+        referents are numbered by their kinds and by the conditions they
+        occur in, not by their names or positions.
+        @return: C{tuple}
+        """
+        return self._key({}, 0)
+
+    def _key(self, labels, level):
+        """
+        Return the key of this expression (see L{canonical_key}), in which
+        the variables bound around it are replaced by their labels.
+        @param labels: C{dict} from C{Variable} to its label, see L{_bind_canonically}
+        @param level: C{int} the number of binders around this expression
+        """
+        return (self.__class__.__name__,) + tuple(child._key(labels, level) for child in self.children())
     
     def substitute_bindings(self, bindings):
+        """
+        Replace the feature variables bound in C{bindings} with their values
+        and simplify. Values that are closed expressions are filled into the
+        holes of the L{template} all at once; as soon as one of them has free
+        variables, which a binder of the expression might capture, the rest
+        is done by capture-avoiding L{replace}, one variable after another.
+        @param bindings: C{dict} from C{Variable} to the values of the features
+        """
+        template = self.template()
+        if template.fits(bindings):
+            variables = template.holes
+        else:
+            template = None
+            variables = self.variables()
         expr = self
-        for var in expr.variables():
+        values = {}
+        for var in variables:
             val = bindings.get(var, None)
             if val:
                 if isinstance(val, Variable):
@@ -299,7 +1044,17 @@ class AbstractDrs(drt.AbstractDrs):
                 else:
                     raise ValueError('Can not substitute a non-expression '
                                          'value into an expression: %r' % (val,))
+                if template is not None:
+                    if not val.free():
+                        values[var] = val
+                        continue
+                    # the variables are replaced in the same order as below,
+                    # so filling in the values so far gives the same expression
+                    expr = template.fill(expr, values)
+                    template = None
                 expr = expr.replace(var, val)
+        if template is not None:
+            return template.instantiate(expr, values)
         return expr.simplify()
 
     RESOLUTION_ORDER = {Binding:0,
@@ -307,49 +1062,122 @@ class AbstractDrs(drt.AbstractDrs):
                         IntermediateAccommodation:2,
                         LocalAccommodation:3}
 
-    def resolve(self, inference_check=None, verbose=False):
+    def resolve(self, inference_check=None, verbose=False, factorize=True, deduplicate=True, partial_check=None,
+                schedule=False, stats=None):
         """
         This method does the whole job of collecting multiple readings.
         We aim to get new readings from the old ones by resolving
         presuppositional DRSs one by one. Every time one presupposition
         is resolved, new readings are created and replace the old ones,
         until there are no presuppositions left to resolve.
+        
+        If C{factorize} is set, presuppositions that do not interact with
+        each other are resolved in a single step: each combination of their
+        readings gives one new reading, and the next presuppositions are
+        only looked for after all of them have been resolved. The readings
+        are the same as when resolving them one by one.
+        
+        If C{deduplicate} is set, a reading that has the same canonical key
+        (see L{canonical_key}) as one checked before is not passed to
+        C{inference_check} again, but gets the result of the earlier check.
+        The readings returned are the same either way.
+        
+        C{partial_check} is an optional function like C{inference_check}
+        that is called on the resolved part (see L{DRS.resolved_part}) of
+        every reading that is a DRS and has presuppositions left to resolve;
+        other readings are not checked before they are resolved. If it fails,
+        the reading is not resolved any further. It should only fail if no
+        resolution of the reading could pass C{inference_check}, e.g. if the
+        resolved part is inconsistent.
+        
+        If C{schedule} is set, the next presupposition to resolve is not
+        the first one but the one with the fewest readings among those that
+        are independent of all the ones before them. As the search stops
+        early on readings that pass C{inference_check}, presuppositions with
+        more than one reading are then only moved ahead if there is no
+        C{inference_check}, so that the same readings are found (though not
+        necessarily in the same order).
+        
+        If a C{stats} dictionary is given, the number of readings built
+        (the nodes of the reading tree expanded) is stored in it under
+        'expanded'.
         """
         readings = []
         errors = []
         if inference_check:
             failed_readings = []
+        # canonical keys of the readings checked so far
+        # mapped to the results of their inference checks
+        checked = {}
         
-        def traverse(base_reading, operations):
+        if inference_check:
+            branching = lambda item: len(item.readings) > 1
+        else:
+            branching = lambda item: len(item.readings)
+        expanded = [0]
+        
+        def next_operations(reading):
+            if schedule:
+                items = sorted(reading.independent_items(True), key=branching)
+                return [item.readings for item in (items if factorize else items[:1])]
+            if factorize:
+                return reading.independent_readings()
+            operations = reading.readings()
+            return [operations[0]] if operations else []
+        
+        def traverse(base_reading, factors, chosen=[]):
+            operations = factors[len(chosen)]
             for operation in sorted(operations, key=lambda o: AbstractDrs.RESOLUTION_ORDER[type(o)]):
-                new_reading = base_reading.deepcopy(operation)
-                if verbose:
-                    print("reading: %s" % new_reading)
-                try:
-                    new_operations = new_reading.readings()
-                except Exception as ex:
-                    errors.append(str(ex))
-                    continue
-                if not new_operations:
-                    if inference_check:
-                        success, error = inference_check(new_reading)
-                        if success:
-                            readings.append(new_reading)
-                            return True
-                        else:
-                            failed_readings.append((new_reading, error))
-                    else:
-                        readings.append(new_reading)
+                if len(chosen) + 1 < len(factors):
+                    # Choose the readings of the remaining independent presuppositions
+                    if not traverse(base_reading, factors, chosen + [operation]):
+                        continue
                 else:
-                    if traverse(new_reading, new_operations[0]):
-                        if len(operations) == 1 or AbstractDrs.RESOLUTION_ORDER[type(operation)] != 0:
-                            return True
+                    new_reading = base_reading.deepcopy(CombinedReading(chosen + [operation]) if chosen else operation)
+                    expanded[0] += 1
+                    if verbose:
+                        print("reading: %s" % new_reading)
+                    try:
+                        new_factors = next_operations(new_reading)
+                    except Exception as ex:
+                        errors.append(str(ex))
+                        continue
+                    if not new_factors:
+                        if inference_check:
+                            if deduplicate:
+                                key = new_reading.canonical_key()
+                                if key not in checked:
+                                    checked[key] = inference_check(new_reading)
+                                success, error = checked[key]
+                            else:
+                                success, error = inference_check(new_reading)
+                            if success:
+                                readings.append(new_reading)
+                                return True
+                            else:
+                                failed_readings.append((new_reading, error))
+                        else:
+                            readings.append(new_reading)
+                        continue
+                    # only a DRS has a resolved part
+                    if partial_check and isinstance(new_reading, DRS):
+                        success, error = partial_check(new_reading.resolved_part())
+                        if not success:
+                            if inference_check:
+                                failed_readings.append((new_reading, error))
+                            continue
+                    if not traverse(new_reading, new_factors):
+                        continue
+                if len(operations) == 1 or AbstractDrs.RESOLUTION_ORDER[type(operation)] != 0:
+                    return True
             return False
 
-        operations = self.readings()
-        if operations:
-            traverse(self, operations[0])
-        else:
+        factors = next_operations(self)
+        if factors:
+            traverse(self, factors)
+        if stats is not None:
+            stats['expanded'] = expanded[0]
+        if not factors:
             return [self]
 
         if not readings and errors:
@@ -357,112 +1185,549 @@ class AbstractDrs(drt.AbstractDrs):
         return readings, failed_readings if inference_check else readings
 
     def readings(self, trail=[]):
-        raise NotImplementedError()
+        """
+        Return the readings of the first unresolved condition in this
+        expression (see L{pending}) and whether the condition is to be
+        removed from its DRS, or None if there is nothing to resolve.
+        """
+        for item in self.pending(trail):
+            if item.error is not None:
+                raise item.error
+            return item.readings, item.remove
+        return None
+
+    def pending(self, trail=[]):
+        """
+        Generate a L{PendingItem} for every unresolved condition in this
+        expression, in the order in which L{readings} would resolve them.
+        The expression is walked depth-first with an explicit stack: an
+        expression is only looked at for readings of its own (see L{_readings})
+        after its L{_resolution_parts}, and only if they have none.
+        """
+        # the stack holds the expressions being walked, each with its trail, its
+        # parts, the number of those walked and the number of items found before
+        stack = []
+        found = 0
+        e, e_trail, parts, done, before = self, trail, self._resolution_parts(trail), 0, 0
+        while True:
+            if done < len(parts):
+                part, part_trail = parts[done]
+                stack.append((e, e_trail, parts, done + 1, before))
+                e, e_trail, parts, done, before = part, part_trail, part._resolution_parts(part_trail), 0, found
+                continue
+            item = None
+            if found > before:
+                if isinstance(e, PresuppositionDRS):
+                    # a presupposition with unresolved conditions of its own is not ready
+                    item = PendingItem(e, e_trail)
+            else:
+                try:
+                    readings = e._readings(e_trail)
+                except Exception as ex:
+                    item = PendingItem(e, e_trail, error=ex)
+                else:
+                    if readings:
+                        item = PendingItem(e, e_trail, readings[0], readings[1])
+            if item is not None:
+                found += 1
+                if item.remove:
+                    # the condition is removed from the DRS it is in
+                    for frame in reversed(stack):
+                        if isinstance(frame[0], DRS):
+                            for reading in item.readings:
+                                reading.append((frame[0], ConditionRemover(frame[3] - 1)))
+                            item.remove = False
+                            break
+                yield item
+            if not stack:
+                return
+            e, e_trail, parts, done, before = stack.pop()
+
+    def _resolution_parts(self, trail):
+        """Return the subexpressions that L{pending} looks for unresolved
+        conditions in, each with its trail"""
+        trail = trail + [self]
+        return [(child, trail) for child in self.children()]
+
+    def _readings(self, trail):
+        """Return the readings of this expression itself and whether it is to
+        be removed from its DRS, or None if it has nothing to resolve"""
+        return None
+
+    def independent_items(self, all_items=False):
+        """
+        Return the first unresolved condition (see L{pending}), followed by
+        the conditions next to it, as long as they are independent of all
+        the conditions before them. With C{all_items}, the conditions after
+        one that is not independent are looked at as well, up to the first
+        one that is not ready to be resolved.
+        """
+        items = []
+        seen = []
+        for item in self.pending():
+            if not seen and item.error is not None:
+                raise item.error
+            if all(item.is_independent_of(other) for other in seen):
+                items.append(item)
+            elif not (all_items and item.is_ready()):
+                break
+            seen.append(item)
+        return items
+
+    def independent_readings(self):
+        """Return the readings of the L{independent_items}"""
+        return [item.readings for item in self.independent_items()]
+
+# the kinds of the nodes of the spine of a SemanticsTemplate: (_HOLE,),
+# (_FEATURES, whether the name is a hole, indices of the features that are
+# holes) and (_INNER, pairs of child indices and spines of those children)
+_HOLE, _FEATURES, _INNER = range(3)
+
+class SemanticsTemplate(object):
+    """
+    The semantics of a grammar production, compiled for the substitution of
+    the values of its feature variables (see L{AbstractDrs.substitute_bindings}).
+    The holes of the template are the free feature variables, and its spine
+    leads from the root of the expression to their occurrences, so that an
+    instance is made by rebuilding the spine alone. The template is shared by
+    all copies of the expression, which are alike down to the last leaf, and
+    only compiled when it is first used (see L{AbstractDrs.template}).
+    """
+    def __init__(self, expression):
+        self._expression = expression
+
+    def compile(self):
+        """Compile the template, unless it has been already"""
+        expression = self._expression
+        if expression is None:
+            return
+        variables = expression.variables()
+        # in the order of the variables, which is the order they are replaced in
+        self.holes = [variable for variable in variables if variable.name.startswith('?')]
+        self.others = variables.difference(self.holes)
+        self.usable = True
+        holes = set(self.holes)
+        found = set()
+        binders = set()
+        self.spine = self._compile(expression, holes, found, binders)
+        # a hole that is also bound somewhere or that is hidden from children()
+        # can only be dealt with by replace()
+        if found != holes or not binders.isdisjoint(holes):
+            self.usable = False
+        self._stable = None
+        self._expression = None
+
+    def _compile(self, expression, holes, found, binders):
+        if not isinstance(expression, AbstractDrs):
+            self.usable = False
+            return None
+        if isinstance(expression, DrtFeatureConstantExpression):
+            name = expression.variable in holes
+            features = tuple(index for index, feature in enumerate(expression.features)
+                             if feature.variable in holes)
+            if name:
+                found.add(expression.variable)
+            found.update(expression.features[index].variable for index in features)
+            return (_FEATURES, name, features) if name or features else None
+        if expression.is_leaf:
+            if expression.variable in holes:
+                found.add(expression.variable)
+                return (_HOLE,)
+            return None
+        if isinstance(expression, DRS):
+            binders.update(expression.refs)
+        elif isinstance(expression, DrtLambdaExpression):
+            binders.add(expression.variable)
+        parts = []
+        for index, child in enumerate(expression.children()):
+            spine = self._compile(child, holes, found, binders)
+            if spine is not None:
+                parts.append((index, spine))
+        return (_INNER, tuple(parts)) if parts else None
+
+    def fits(self, bindings):
+        """
+        Return whether the bindings can be substituted by filling the holes.
+        They can not if they bind any other variable of the expression, or
+        if they bind a variable to another bound variable, which replace()
+        would go on to replace in turn.
+        """
+        if not self.usable or not self.others.isdisjoint(bindings):
+            return False
+        for value in bindings.itervalues():
+            if isinstance(value, Variable) and value in bindings:
+                return False
+        return True
+
+    def fill(self, expression, values, spine=None):
+        """
+        Return a copy of the expression with the values filled into the holes.
+        @param expression: C{AbstractDrs} the expression of the template or a copy
+        @param values: C{dict} from the C{Variable} of a hole to C{AbstractDrs}
+        """
+        if spine is None:
+            if not values or self.spine is None:
+                return expression
+            spine = self.spine
+        kind = spine[0]
+        if kind == _HOLE:
+            return values.get(expression.variable, expression)
+        if kind == _FEATURES:
+            variable = expression.variable
+            if spine[1] and variable in values:
+                variable = values[variable].variable
+            features = list(expression.features)
+            for index in spine[2]:
+                features[index] = values.get(features[index].variable, features[index])
+            return expression.__class__(variable, features)
+        children = list(expression.children())
+        for index, child_spine in spine[1]:
+            children[index] = self.fill(children[index], values, child_spine)
+        return expression._copy(children, [])
+
+    def instantiate(self, expression, values):
+        """
+        Return the simplified expression with the values filled in. When the
+        expression is already as simple as it gets and the values are all
+        variables or constants, the filled in expression is as simple too:
+        the holes are leaves as well, and simplify() treats all leaves alike,
+        so whether the expression is as simple as it gets is found out once,
+        on the expression of the template before it is filled.
+        @param values: C{dict} from the C{Variable} of a hole to a closed C{AbstractDrs}
+        """
+        if all(getattr(value, 'is_leaf', False) for value in values.itervalues()):
+            if self._stable is None:
+                self._stable = _simplifies_to_itself(expression)
+            if self._stable:
+                return self.fill(expression, values)
+        return self.fill(expression, values).simplify()
+
+def _simplifies_to_itself(expression):
+    """Return whether simplify() gives back the same expression, without giving out
+    unique variables of the current allocator"""
+    with VariableAllocator(0) as allocator:
+        simplified = expression.simplify()
+    return allocator.count == 0 and _identical(expression, simplified)
+
+def _identical(first, second):
+    """Return whether two expressions are built alike, down to the classes of their parts"""
+    if first.__class__ is not second.__class__ or not isinstance(first, AbstractDrs):
+        return False
+    if isinstance(first, DrtFeatureConstantExpression):
+        return first.variable == second.variable and len(first.features) == len(second.features) and \
+            all(_identical(a, b) for a, b in zip(first.features, second.features))
+    if first.is_leaf:
+        return first.variable == second.variable
+    if isinstance(first, DRS):
+        if first.refs != second.refs:
+            return False
+    elif isinstance(first, DrtLambdaExpression):
+        if first.variable != second.variable:
+            return False
+    children = first.children()
+    others = second.children()
+    return len(children) == len(others) and all(_identical(a, b) for a, b in zip(children, others))
+
+def _bind_canonically(refs, parts, labels, level, key):
+    """
+    Return a copy of C{labels} with the refs bound at the given level and
+    the keys of the parts with these labels. The
+    label of a ref is its level, its number and its kind. The refs are
+    numbered in the order of their kinds and of the keys of the parts they
+    occur in, so that the numbers depend neither on the names nor on the
+    order of the refs and the parts; refs that can not be told apart in
+    this way are numbered in the order they are given.
+    @param refs: C{list} of C{Variable}
+    @param parts: C{list} of the expressions the refs are bound in
+    @param key: C{function} that returns the key of a part, given the labels and the level
+    @return: C{tuple} of the labels and the C{list} of the keys of the parts
+    """
+    refs = [ref for position, ref in enumerate(refs) if ref not in refs[:position]]
+    if not refs:
+        return labels, [key(part, labels, level) for part in parts]
+    anonymous = dict(labels)
+    for ref in refs:
+        anonymous[ref] = (level, None, variable_kind(ref.name))
+    plain = [key(part, anonymous, level) for part in parts]
+    # a part is only keyed again for the refs that are free in it, otherwise
+    # nested binders would be keyed over and over for the refs around them
+    free = [part.free(False) for part in parts]
+    signatures = []
+    for position, ref in enumerate(refs):
+        kind = variable_kind(ref.name)
+        marked = dict(anonymous)
+        marked[ref] = (level, -1, kind)
+        occurrences = []
+        for part, part_key, part_free in zip(parts, plain, free):
+            if ref not in part_free:
+                continue
+            marked_key = key(part, marked, level)
+            if marked_key != part_key:
+                occurrences.append(marked_key)
+        signatures.append((kind, sorted(occurrences), position))
+    signatures.sort()
+    labels = dict(labels)
+    for number, (kind, occurrences, position) in enumerate(signatures):
+        labels[refs[position]] = (level, number, kind)
+    # the key of a part that none of the refs are free in is the plain one
+    refs = set(refs)
+    keys = [key(part, labels, level) if refs & part_free else part_key
+            for part, part_key, part_free in zip(parts, plain, free)]
+    return labels, keys
+
+def _cond_key(cond, labels, level):
+    """Return the key of a condition of a DRS; the referents of a presupposition DRS are bound by the DRS"""
+    if isinstance(cond, PresuppositionDRS):
+        return cond._key(labels, level + 1, True)
+    return cond._key(labels, level + 1)
+
+# the generations of the DRSs changed in place, see DRS.invalidate
+_generations = itertools.count(1)
 
 class DRS(AbstractDrs, drt.DRS):
     """A Temporal Discourse Representation Structure."""
-    
-    def fol(self):
-        if not self.conds:
+
+    __slots__ = ('refs', 'conds', '_caches', '_generation', '_antecedent_index')
+
+    def __init__(self, refs, conds):
+        self.refs = refs
+        self.conds = conds
+        self._caches = None
+        # the version of the refs and the conds, see invalidate
+        self._generation = 0
+        self._antecedent_index = None
+
+    def children(self):
+        return self.conds
+
+    def _fol(self, parts):
+        if not parts:
             raise Exception("Cannot convert DRS with no conditions to FOL.")
-        accum = reduce(AndExpression, [c.fol() for c in self.conds])
+        accum = reduce(FolAndExpression, parts)
         for ref in ReverseIterator(self.refs):
-            accum = ExistsExpression(ref, AndExpression(accum, self._ref_type(ref).fol()))
+            accum = FolExistsExpression(ref, FolAndExpression(accum, self._ref_type(ref).fol()))
         return accum
 
     def _ref_type(self, referent):
         """Checks a referent type and returns corresponding predicate"""
         ref_cond = None
         if is_eventvar(referent.name):
-            ref_cond = drt.DrtConstantExpression(Variable("event"))
+            ref_cond = DrtConstantExpression(intern_variable("event"))
         elif is_statevar(referent.name):
-            ref_cond = drt.DrtConstantExpression(Variable("state"))
+            ref_cond = DrtConstantExpression(intern_variable("state"))
         elif is_timevar(referent.name):
-            ref_cond = drt.DrtConstantExpression(Variable("time"))
+            ref_cond = DrtConstantExpression(intern_variable("time"))
         else:
-            ref_cond = drt.DrtConstantExpression(Variable("individual"))
+            ref_cond = DrtConstantExpression(intern_variable("individual"))
         
         return DrtApplicationExpression(ref_cond, DrtAbstractVariableExpression(referent))
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, DRS) or len(self.refs) != len(other.refs) or hash(self) != hash(other):
+            return False
+        # rename the referents of other after those of self in one go
+        mapping = dict((r2, self.make_VariableExpression(r1)) for (r1, r2) in zip(self.refs, other.refs) if r1 != r2)
+        return self.conds == [cond.substitute(mapping, True) for cond in other.conds]
+
+    def __hash__(self):
+        return self._cached('hash', self._hash, {})
+
+    def _hash(self, bound, level=0):
+        if self.refs:
+            bound = self._bind(bound, self.refs, level)
+        return hash((DRS, len(self.refs)) + tuple(cond._hash(bound, level + 1) for cond in self.conds))
+
+    def _key(self, labels, level, bound=False):
+        """
+        @see: AbstractDrs._key()
+        @param bound: C{boolean} whether the refs of this DRS are bound by
+        the DRS it is a condition of, as those of a presupposition DRS are
+        """
+        refs = self.get_refs()
+        if bound:
+            refs = refs[len(self.refs):]
+        labels, keys = _bind_canonically(refs, self.conds, labels, level, _cond_key)
+        return (self.__class__.__name__, tuple(sorted(variable_kind(ref.name) for ref in self.refs)),
+                tuple(sorted(keys)))
     
 
-    def replace(self, variable, expression, replace_bound=False):
-        """Replace all instances of variable v with expression E in self,
-        where v is free in self."""
-        if variable in self.get_refs():
-            #if a bound variable is the thing being replaced
-            if not replace_bound:
-                return self
-            else:
-                if variable in self.refs:
-                    i = self.refs.index(variable)
-                    refs = self.refs[:i] + [expression.variable] + self.refs[i + 1:]
-                else:
-                    refs = self.refs
-                return self.__class__(refs,
-                           [cond.replace(variable, expression, True) for cond in self.conds])
-        else:
-            #variable not bound by this DRS
+    def _substitute(self, mapping, forced, free):
+        """@see: AbstractDrs._substitute()"""
+        bound = set(self.get_refs())
+        kept = bound.intersection(mapping).difference(forced)
+        if kept:
+            mapping = dict((variable, expression) for variable, expression in mapping.iteritems()
+                           if variable not in kept)
+        if not mapping:
+            return self, None
+
+        # any bound variable that appears in an expression replacing
+        # a free variable must be alpha converted to avoid a conflict
+        clashes = set()
+        for variable, variables in free.iteritems():
+            if variable in mapping and variable not in bound:
+                clashes.update(bound & variables)
+        if clashes:
+            # the renaming goes with the replacements, but a renamed ref that
+            # is to be replaced anyway is replaced by its expression
+            mapping = dict(mapping)
+            free = dict(free)
+            for ref in clashes:
+                if ref not in mapping:
+                    variable = unique_variable(ref)
+                    mapping[ref] = DrtVariableExpression(variable)
+                    free[ref] = set([variable])
+            forced = forced | clashes
+
+        refs = [mapping[ref].variable if ref in mapping else ref for ref in self.refs]
+        args = (mapping, forced, free)
+        return refs, [(cond, args) for cond in self.conds]
+
+    def _substituted(self, refs, parts):
+        return self.__class__(refs, parts)
             
-            # any bound variable that appears in the expression must
-            # be alpha converted to avoid a conflict
-            for ref in (set(self.get_refs()) & expression.free()):
-                newvar = unique_variable(ref) 
-                newvarex = DrtVariableExpression(newvar)
-                if ref in self.refs:
-                    i = self.refs.index(ref)
-                    refs = self.refs[:i] + [newvar] + self.refs[i + 1:]
-                else:
-                    refs = self.refs
-                self = self.__class__(refs,
-                           [cond.replace(ref, newvarex, True) 
-                            for cond in self.conds])
-                
-            #replace in the conditions
-            return self.__class__(self.refs,
-                       [cond.replace(variable, expression, replace_bound) 
-                        for cond in self.conds])
-            
-    def free(self, indvar_only=True):
-        """@see: Expression.free()"""
-        conds_free = reduce(operator.or_,
-                            [c.free(indvar_only) for c in self.conds], set()) 
-        return conds_free - (set(self.refs) | reduce(operator.or_, [set(c.refs) for c in self.conds if isinstance(c, PresuppositionDRS)], set()))
+    def _free(self, indvar_only):
+        caches = self._caches
+        if caches is not None and ('free', indvar_only) in caches:
+            return set(caches[('free', indvar_only)]), None
+        return AbstractDrs._free(self, indvar_only)
+
+    def _join_free(self, indvar_only, parts):
+        """The result is cached, like that of L{get_refs}"""
+        bound = set(self.refs)
+        for c in self.conds:
+            if isinstance(c, PresuppositionDRS):
+                bound.update(c.refs)
+        free = set().union(*parts) - bound
+        if self._caches is None:
+            self._caches = {}
+        self._caches[('free', indvar_only)] = free
+        return set(free)
 
     def get_refs(self, recursive=False):
         """@see: AbstractExpression.get_refs()"""
-        if recursive:
-            cond_refs = reduce(operator.add,
-                               [c.get_refs(True) for c in self.conds], [])
-            return self.refs + cond_refs
-        else:
-            return self.refs + reduce(operator.add, [c.refs for c in self.conds if isinstance(c, PresuppositionDRS)], [])
+        return list(self._cached(('refs', recursive), self._get_refs, recursive))
 
-    def deepcopy(self, operations=[]):
-        """This method returns a deep copy of the DRS.
-        Optionally, it can take a list of lists of tuples (DRS, function) 
-        as an argument and generate a reading by performing 
-        a substitution in the DRS as specified by the function.
-        @param operations: a list of lists of tuples
-        """
+    def _get_refs(self, recursive):
+        if recursive:
+            return AbstractDrs.get_refs(self, True)
+        refs = list(self.refs)
+        for c in self.conds:
+            if isinstance(c, PresuppositionDRS):
+                refs.extend(c.refs)
+        return refs
+
+    def _ref_parts(self, recursive):
+        if not recursive:
+            return self.get_refs(), ()
+        caches = self._caches
+        if caches is not None and ('refs', True) in caches:
+            return caches[('refs', True)], ()
+        return self.refs, self.conds
+
+    def _cached(self, key, compute, argument):
+        """Return the cached result of compute(argument), computing it on the first call.
+        The cache is kept until L{invalidate} is called."""
+        caches = self._caches
+        if caches is None:
+            caches = self._caches = {}
+        try:
+            return caches[key]
+        except KeyError:
+            result = caches[key] = compute(argument)
+            return result
+
+    def invalidate(self):
+        """Drop the cached results of L{free}, L{get_refs} and the hash, and start a
+        new generation, which the L{AntecedentIndex} is checked against. Must be
+        called whenever the refs or the conds of this DRS are changed in place."""
+        self._caches = None
+        self._generation = next(_generations)
+
+    def _copy(self, children, operations):
         functions = [function for drs, function in operations if drs is self]
-        newdrs = self.__class__(list(self.refs), [cond.deepcopy(operations) for cond in self.conds])
-        for function in functions:
-            newdrs = function(newdrs)
+        newdrs = self.__class__(list(self.refs), children)
+        if functions:
+            if isinstance(operations, CombinedReading):
+                return operations.apply(self, newdrs)
+            for function in functions:
+                newdrs = function(newdrs)
+        elif self._antecedent_index is not None:
+            # the copy is alike, so it is of the same generation
+            newdrs._generation = self._generation
+            newdrs._antecedent_index = self._antecedent_index
         return newdrs
 
-    def simplify(self):
-        return self.__class__(self.refs, [cond.simplify() for cond in self.conds])
+    def antecedent_index(self, collect_event_data):
+        """Return the L{AntecedentIndex} of this DRS, (re)building it if necessary"""
+        index = self._antecedent_index
+        if index is None or not index.is_valid(self):
+            index = self._antecedent_index = AntecedentIndex(self, collect_event_data)
+        return index
 
-    def readings(self, trail=[]):
-        """get the readings for this DRS"""
-        for i, cond in enumerate(self.conds):
-            _readings = cond.readings(trail + [self])
-            if _readings:
-                if _readings[1]:
-                    for reading in _readings[0]:
-                        reading.append((self, ConditionRemover(i)))
-                return _readings[0], False
+    def _simplify(self, parts):
+        return self.__class__(self.refs, parts)
+
+    def resolved_part(self, trail=[]):
+        """
+        Return this DRS with its unresolved conditions abstracted away.
+        Complex conditions that contain unresolved ones are left out as a
+        whole, only embedded DRSs are abstracted in turn. The conditions that
+        mention the referents of the presuppositions left out are left out
+        as well, so every resolution of this DRS entails the result.
+        """
+        dropped_refs = set()
+        def resolved(cond, trail):
+            if isinstance(cond, PresuppositionDRS):
+                dropped_refs.update(cond.get_refs(True))
+            elif isinstance(cond, DRS):
+                return None
+            elif next(cond.pending(trail), None) is not None:
+                dropped_refs.update(cond.get_refs(True))
+            else:
+                return True
+            return False
+
+        def unmentioned(cond, trail):
+            if isinstance(cond, DRS):
+                return None
+            return cond.free().isdisjoint(dropped_refs)
+
+        result = self._prune(trail, resolved)
+        return result._prune(trail, unmentioned) if dropped_refs else result
 
+    def _prune(self, trail, keep):
+        """
+        Return a copy of this DRS with the conditions left out that C{keep}
+        is false for. The DRSs among the conditions that it returns C{None}
+        for are pruned in turn, and left out if no condition is left in them.
+        The DRSs are walked with an explicit stack.
+        @param keep: C{function} of a condition and its trail
+        """
+        # the stack holds the DRSs being pruned, each with the trail of its
+        # conditions, an iterator over the remaining ones and those kept so far
+        stack = []
+        drs, cond_trail, remaining, conds = self, trail + [self], iter(self.conds), []
+        while True:
+            for cond in remaining:
+                kept = keep(cond, cond_trail)
+                if kept is None:
+                    stack.append((drs, cond_trail, remaining, conds))
+                    drs, cond_trail, remaining, conds = cond, cond_trail + [cond], iter(cond.conds), []
+                    break
+                elif kept:
+                    conds.append(cond)
+            else:
+                pruned = drs.__class__(drs.refs, conds)
+                if not stack:
+                    return pruned
+                drs, cond_trail, remaining, conds = stack.pop()
+                if pruned.conds:
+                    conds.append(pruned)
+
+    @walked
     def str(self, syntax=DrtTokens.NLTK):
         if syntax == DrtTokens.PROVER9:
             return self.fol().str(syntax)
@@ -476,28 +1741,87 @@ def DrtVariableExpression(variable):
     C{DrtAbstractVariableExpression} appropriate for the given variable.
     """
 
-    if is_indvar(variable.name):
+    kind = variable_kind(variable.name)
+    if kind & INDIVIDUAL:
         return DrtIndividualVariableExpression(variable)
-    elif is_funcvar(variable.name):
+    elif kind & FUNCTION:
         return DrtFunctionVariableExpression(variable)
-    elif is_eventvar(variable.name):
+    elif kind & EVENT:
         return DrtEventVariableExpression(variable)
-    elif is_statevar(variable.name):
+    elif kind & STATE:
         return DrtStateVariableExpression(variable)
-    elif is_uttervar(variable.name):
+    elif kind & UTTER:
         return DrtUtterVariableExpression(variable)
-    elif is_timevar(variable.name):
+    elif kind & TIME:
         return DrtTimeVariableExpression(variable)
     else:
         return DrtConstantExpression(variable)
     
 
-class DrtAbstractVariableExpression(AbstractDrs, drt.DrtAbstractVariableExpression):   
-    def readings(self, trail=[]):
-        return None
-    
-    def deepcopy(self, operations=[]):
-        return self.__class__(self.variable)
+class DrtAbstractVariableExpression(AbstractDrs, drt.DrtAbstractVariableExpression):
+    """Leaf expressions are interned: constructing one for a class and a
+    variable name that are already in use returns the existing instance."""
+
+    __slots__ = ('variable',)
+
+    _interned = WeakValueDictionary()
+
+    is_leaf = True
+
+    def __new__(cls, variable=None, *args):
+        if variable is None:
+            # unpickling and copying go through here
+            return AbstractDrs.__new__(cls)
+        key = (cls, variable.name)
+        try:
+            return cls._interned[key]
+        except KeyError:
+            expression = cls._interned[key] = AbstractDrs.__new__(cls)
+            return expression
+
+    def __init__(self, variable):
+        if getattr(self, 'variable', None) is None:
+            drt.DrtAbstractVariableExpression.__init__(self, intern_variable(variable.name))
+
+    def __eq__(self, other):
+        return self is other or drt.DrtAbstractVariableExpression.__eq__(self, other)
+
+    def __hash__(self):
+        return hash(self.variable.name)
+
+    def _hash(self, bound, level=0):
+        try:
+            binder, position = bound[self.variable]
+        except KeyError:
+            # free variables of different classes are equal if their names are
+            return hash(self.variable.name)
+        return hash((level - binder, position))
+
+    def _key(self, labels, level):
+        return labels.get(self.variable, self.variable.name)
+
+    def substitute(self, mapping, replace_bound=False):
+        """@see: AbstractDrs.substitute()"""
+        return mapping.get(self.variable, self)
+
+    def _substitute(self, mapping, forced, free):
+        return self.substitute(mapping), None
+
+    def free(self, indvar_only=True):
+        """@see: Expression.free()"""
+        return super(AbstractDrs, self).free(indvar_only)
+
+    def _free(self, indvar_only):
+        return self.free(indvar_only), None
+
+    def _resolution_parts(self, trail):
+        return ()
+
+    def _copy(self, children, operations):
+        return self
+
+    def _fol(self, parts):
+        return self
 
 class DrtIndividualVariableExpression(DrtAbstractVariableExpression, drt.DrtIndividualVariableExpression):
     pass
@@ -529,15 +1853,22 @@ class DrtFeatureExpression(DrtConstantExpression):
 
 class DrtFeatureConstantExpression(DrtConstantExpression):
     """A constant expression with syntactic features attached"""
+
+    __slots__ = ('features',)
+
+    def __new__(cls, *args):
+        # not interned, the features are part of the expression
+        return AbstractDrs.__new__(cls)
+
     def __init__(self, variable, features):
-        DrtConstantExpression.__init__(self, variable)
-        self.features = features
+        drt.DrtConstantExpression.__init__(self, intern_variable(variable.name))
+        self.features = tuple(features)
 
-    def replace(self, variable, expression, replace_bound=False):
-        """@see: Expression.replace()"""
-        assert isinstance(variable, Variable), "%s is not a Variable" % variable
-        assert isinstance(expression, Expression), "%s is not an Expression" % expression
-        return self.__class__(DrtConstantExpression.replace(self, variable, expression, replace_bound).variable, [feature.replace(variable, expression, replace_bound) for feature in self.features])
+    def substitute(self, mapping, replace_bound=False):
+        """@see: AbstractDrs.substitute()"""
+        if not mapping:
+            return self
+        return self.__class__(DrtConstantExpression.substitute(self, mapping, replace_bound).variable, [feature.substitute(mapping, replace_bound) for feature in self.features])
 
     def visit(self, function, combinator, default):
         """@see: Expression.visit()"""
@@ -548,10 +1879,7 @@ class DrtFeatureConstantExpression(DrtConstantExpression):
     def str(self, syntax=DrtTokens.NLTK):
         return str(self.variable) + "{" + ",".join([str(feature) for feature in self.features]) + "}"
     
-    def deepcopy(self, operations=[]):
-        return self.__class__(self.variable, self.features)
-    
-    def fol(self):
+    def _fol(self, parts):
         return DrtConstantExpression(self.variable)
 
 class DrtProperNameExpression(DrtConstantExpression):
@@ -559,13 +1887,23 @@ class DrtProperNameExpression(DrtConstantExpression):
     pass
 
 class DrtNegatedExpression(AbstractDrs, drt.DrtNegatedExpression):
-    def readings(self, trail=[]):
-        return self.term.readings(trail + [self])
+    __slots__ = ('term',)
 
-    def deepcopy(self, operations=None):
-        return self.__class__(self.term.deepcopy(operations))
+    def children(self):
+        return (self.term,)
+
+    def _ref_parts(self, recursive):
+        return (), (self.term,)
+
+    def _hash(self, bound, level=0):
+        return hash((DrtNegatedExpression, self.term._hash(bound, level)))
+
+    def _fol(self, parts):
+        return FolNegatedExpression(*parts)
 
 class DrtLambdaExpression(AbstractDrs, drt.DrtLambdaExpression):
+    __slots__ = ('variable', 'term')
+
     def alpha_convert(self, newvar):
         """Rename all occurrences of the variable introduced by this variable
         binder in the expression to @C{newvar}.
@@ -574,145 +1912,227 @@ class DrtLambdaExpression(AbstractDrs, drt.DrtLambdaExpression):
         return self.__class__(newvar, self.term.replace(self.variable,
                           DrtVariableExpression(newvar), True))
 
-    def replace(self, variable, expression, replace_bound=False):
-        """@see: Expression.replace()"""
-        assert isinstance(variable, Variable), "%s is not a Variable" % variable
-        assert isinstance(expression, Expression), "%s is not an Expression" % expression
-        #if the bound variable is the thing being replaced
-        if self.variable == variable:
-            if replace_bound: 
+    def _substitute(self, mapping, forced, free):
+        """@see: AbstractDrs._substitute()"""
+        variable = self.variable
+        if variable in mapping:
+            if variable in forced:
+                expression = mapping[variable]
                 assert isinstance(expression, DrtAbstractVariableExpression), \
                        "%s is not a AbstractVariableExpression" % expression
-                return self.__class__(expression.variable,
-                                      self.term.replace(variable, expression, True))
-            else: 
-                return self
-        else:
-            # if the bound variable appears in the expression, then it must
-            # be alpha converted to avoid a conflict
-            if self.variable in expression.free():
-                self = self.alpha_convert(unique_variable(pattern=self.variable))
-                
-            #replace in the term
-            return self.__class__(self.variable,
-                                  self.term.replace(variable, expression, replace_bound))
-
-    def readings(self, trail=[]):
-        return self.term.readings(trail + [self])
-    
-    def deepcopy(self, operations=[]):
-        return self.__class__(self.variable, self.term.deepcopy(operations))
-    
-    def get_refs(self, recursive=False):
-        """@see: AbstractExpression.get_refs()"""
-        return []
+                return expression.variable, [(self.term, (mapping, forced, free))]
+            mapping = dict(mapping)
+            del mapping[variable]
+            if not mapping:
+                return self, None
+        # if the bound variable appears in one of the expressions,
+        # then it must be alpha converted to avoid a conflict
+        for replaced, variables in free.iteritems():
+            if variable in variables and replaced in mapping:
+                variable = unique_variable(pattern=self.variable)
+                mapping = dict(mapping)
+                mapping[self.variable] = DrtVariableExpression(variable)
+                free = dict(free)
+                free[self.variable] = set([variable])
+                forced = forced | set([self.variable])
+                break
+        return variable, [(self.term, (mapping, forced, free))]
+
+    def _substituted(self, variable, parts):
+        return self.__class__(variable, *parts)
+
+    def children(self):
+        return (self.term,)
+
+    def _copy(self, children, operations):
+        return self.__class__(self.variable, *children)
+
+    def _fol(self, parts):
+        return FolLambdaExpression(self.variable, *parts)
+
+    def _hash(self, bound, level=0):
+        return hash((DrtLambdaExpression, self.term._hash(self._bind(bound, [self.variable], level), level + 1)))
+
+    def _key(self, labels, level):
+        labels = dict(labels)
+        labels[self.variable] = (level, 0, variable_kind(self.variable.name))
+        return (DrtLambdaExpression.__name__, self.term._key(labels, level + 1))
+
+    def _join_free(self, indvar_only, parts):
+        return parts[0] - set([self.variable])
+
+    def _ref_parts(self, recursive):
+        return (), ()
 
 class DrtBooleanExpression(AbstractDrs, drt.DrtBooleanExpression):
-    def readings(self, trail=[]):
-        first_readings = self.first.readings(trail + [self])
-        if first_readings:
-            return first_readings
-        else:
-            return self.second.readings(trail + [self])
-    
-    def deepcopy(self, operations=[]):
-        return self.__class__(self.first.deepcopy(operations), self.second.deepcopy(operations))
+    __slots__ = ('first', 'second')
 
-    def simplify(self):
+    def children(self):
+        return (self.first, self.second)
+
+    def _hash(self, bound, level=0):
+        """A subclass of a binary expression is equal to it, so the
+        operator is hashed rather than the class"""
+        return hash((self.getOp(), self.first._hash(bound, level), self.second._hash(bound, level)))
+
+    def _simplify_parts(self):
         """When dealing with DRSs, it is good to have unique names for
         the referents bound by each DRS."""
         if isinstance(self.first, DRS) and isinstance(self.second, DRS):
-            new_second = self.second
-            for ref in set(self.first.get_refs(True)) & set(self.second.get_refs(True)):
-                newref = DrtVariableExpression(unique_variable(ref))
-                new_second = self.second.replace(ref, newref, True)
-
-            return drt.DrtBooleanExpression.simplify(self.__class__(self.first, new_second))
-        
-        else:
-            return drt.DrtBooleanExpression.simplify(self)
+            return (self.first, self.second.substitute(dict((ref, DrtVariableExpression(unique_variable(ref)))
+                for ref in set(self.first.get_refs(True)) & set(self.second.get_refs(True))), True))
+        return self.children()
     
 class DrtOrExpression(DrtBooleanExpression, drt.DrtOrExpression):
-    pass
+    def _fol(self, parts):
+        return FolOrExpression(*parts)
 
 class DrtImpExpression(DrtBooleanExpression, drt.DrtImpExpression):
-    def readings(self, trail=[]):
-        first_readings = self.first.readings(trail + [self])
-        if first_readings:
-            return first_readings
+    def _fol_parts(self):
+        return tuple(self.first.conds) + (self.second,)
+
+    def _fol(self, parts):
+        if len(parts) > 1:
+            accum = FolImpExpression(reduce(FolAndExpression, parts[:-1]), parts[-1])
         else:
-            return self.second.readings(trail + [self, self.first])
+            accum = parts[-1]
+        for ref in self.first.refs[::-1]:
+            accum = FolAllExpression(ref, accum)
+        return accum
+
+    def _resolution_parts(self, trail):
+        # the consequent is resolved in the context of the antecedent
+        return [(self.first, trail + [self]), (self.second, trail + [self, self.first])]
 
     def __eq__(self, other):
-        if (isinstance(self, other.__class__) or isinstance(other, self.__class__)):
-            if isinstance(self.first, DRS) and isinstance(self.second, DRS) and isinstance(other.first, DRS) and isinstance(other.second, DRS):
-                if len(self.first.conds) == len(other.first.conds) and len(self.second.conds) == len(other.second.conds):
-                    for (r1, r2) in zip(self.first.refs + self.second.refs, other.first.refs + other.second.refs):
-                        varex = self.make_VariableExpression(r1)
-                        other = other.replace(r2, varex, True)
-                    return self.first.conds == other.first.conds and self.second.conds == other.second.conds
-            else:        
-                return self.first == other.first and self.second == other.second
-        return False
+        """Implications of DRSs are equal up to the names of the referents of
+        their antecedents and consequents. Implications whose conditions are
+        in another order are not equal, but they have the same
+        L{canonical_key}, by which readings are deduplicated."""
+        if self is other:
+            return True
+        if not isinstance(other, DrtImpExpression) or hash(self) != hash(other):
+            return False
+        first = self.first
+        second = self.second
+        if isinstance(first, DRS) and isinstance(second, DRS) and \
+            isinstance(other.first, DRS) and isinstance(other.second, DRS):
+            # rename the referents of other after those of self in one go
+            mapping = dict((r2, self.make_VariableExpression(r1)) for (r1, r2)
+                           in zip(first.refs + second.refs, other.first.refs + other.second.refs) if r1 != r2)
+            return first.conds == [cond.substitute(mapping, True) for cond in other.first.conds] and \
+                second.conds == [cond.substitute(mapping, True) for cond in other.second.conds]
+        return first == other.first and second == other.second
+
+    def _hash(self, bound, level=0):
+        if isinstance(self.first, DRS) and isinstance(self.second, DRS):
+            # the referents are renamed in both DRSs at once, see __eq__,
+            # so only the numbers of the referents and conditions are hashed
+            return hash((DrtImpExpression, len(self.first.refs), len(self.second.refs),
+                         len(self.first.conds), len(self.second.conds)))
+        return DrtBooleanExpression._hash(self, bound, level)
+
+    def _key(self, labels, level):
+        first = self.first
+        second = self.second
+        if not (isinstance(first, DRS) and isinstance(second, DRS)):
+            return DrtBooleanExpression._key(self, labels, level)
+        # the referents of the antecedent are bound in the consequent as well
+        def key(part, labels, level):
+            if part is second:
+                return second._key(labels, level + 1)
+            return _cond_key(part, labels, level)
+        labels, keys = _bind_canonically(first.get_refs(), first.conds + [second], labels, level, key)
+        return (DrtImpExpression.__name__, first.__class__.__name__,
+                tuple(sorted(variable_kind(ref.name) for ref in first.refs)),
+                tuple(sorted(keys[:-1])), keys[-1])
 
 class DrtIffExpression(DrtBooleanExpression, drt.DrtIffExpression):
-    pass
+    def _fol(self, parts):
+        return FolIffExpression(*parts)
 
 class DrtEqualityExpression(AbstractDrs, drt.DrtEqualityExpression):
-    def readings(self, trail=[]):
-        return None
-    
-    def deepcopy(self, operations=[]):
-        return self.__class__(self.first.deepcopy(operations), self.second.deepcopy(operations))
+    __slots__ = ('first', 'second')
+
+    def children(self):
+        return (self.first, self.second)
+
+    def _hash(self, bound, level=0):
+        """@see: DrtBooleanExpression._hash()"""
+        return hash((self.getOp(), self.first._hash(bound, level), self.second._hash(bound, level)))
+
+    def _resolution_parts(self, trail):
+        return ()
+
+    def _fol(self, parts):
+        return FolEqualityExpression(*parts)
 
 class ConcatenationDRS(DrtBooleanExpression, drt.ConcatenationDRS):
     """DRS of the form '(DRS + DRS)'"""
-    def replace(self, variable, expression, replace_bound=False):
-        """Replace all instances of variable v with expression E in self,
-        where v is free in self."""
-        first = self.first
-        second = self.second
+    def _hash(self, bound, level=0):
+        bound = self._bind(bound, self.get_refs(), level)
+        return hash((ConcatenationDRS, self.first._hash(bound, level + 1), self.second._hash(bound, level + 1)))
 
-        # If variable is bound by both first and second 
-        if isinstance(first, DRS) and isinstance(second, DRS) and \
-           variable in (set(first.get_refs(True)) & set(second.get_refs(True))):
-            first = first.replace(variable, expression, True)
-            second = second.replace(variable, expression, True)
-            
-        # If variable is bound by first
-        elif isinstance(first, DRS) and variable in first.refs:
-            if replace_bound: 
-                first = first.replace(variable, expression, replace_bound)
-                second = second.replace(variable, expression, replace_bound)
-
-        # If variable is bound by second
-        elif isinstance(second, DRS) and variable in second.refs:
-            if replace_bound:
-                first = first.replace(variable, expression, replace_bound)
-                second = second.replace(variable, expression, replace_bound)
+    def _fol(self, parts):
+        return FolAndExpression(*parts)
 
-        else:
-            # alpha convert every ref that is free in 'expression'
-            for ref in (set(self.get_refs(True)) & expression.free()): 
-                v = DrtVariableExpression(unique_variable(ref))
-                first = first.replace(ref, v, True)
-                second = second.replace(ref, v, True)
-
-            first = first.replace(variable, expression, replace_bound)
-            second = second.replace(variable, expression, replace_bound)
-            
-        return self.__class__(first, second)
+    def _ref_parts(self, recursive):
+        return (), (self.first, self.second)
 
-    def simplify(self):
-        first = self.first.simplify()
-        second = self.second.simplify()
+    def _substitute(self, mapping, forced, free):
+        """@see: AbstractDrs._substitute()"""
+        first = self.first
+        second = self.second
+        if isinstance(first, DRS) and isinstance(second, DRS):
+            bound_by_both = set(first.get_refs(True)) & set(second.get_refs(True))
+        else:
+            bound_by_both = set()
+
+        # Variables bound by both first and second are always replaced as bound
+        # ones, variables bound by either of them only if they are forced to be
+        bound = set()
+        unbound = {}
+        for variable, expression in mapping.iteritems():
+            if variable in bound_by_both:
+                bound.add(variable)
+            elif (isinstance(first, DRS) and variable in first.refs) or \
+                 (isinstance(second, DRS) and variable in second.refs):
+                if variable in forced:
+                    bound.add(variable)
+            else:
+                unbound[variable] = expression
+
+        # alpha convert every ref that is free in one of the expressions,
+        # unless it is to be replaced as a bound one anyway
+        refs = set(self.get_refs(True))
+        clashes = set()
+        for variable, variables in free.iteritems():
+            if variable in unbound:
+                clashes.update(refs & variables)
+        mapping = dict((variable, mapping[variable]) for variable in bound)
+        mapping.update(unbound)
+        if clashes - bound:
+            free = dict(free)
+        for ref in clashes:
+            if ref not in bound:
+                variable = unique_variable(ref)
+                mapping[ref] = DrtVariableExpression(variable)
+                free[ref] = set([variable])
+        if not mapping:
+            return self, None
+        args = (mapping, forced | bound | clashes, free)
+        return None, [(first, args), (second, args)]
+
+    def _simplify_parts(self):
+        return self.children()
+
+    def _simplify(self, parts):
+        first, second = parts
 
         if isinstance(first, DRS) and isinstance(second, DRS):
-            # For any ref that is in both 'first' and 'second'
-            for ref in (set(first.get_refs(True)) & set(second.get_refs(True))):
-                # alpha convert the ref in 'second' to prevent collision
-                newvar = DrtVariableExpression(unique_variable(ref))
-                second = second.replace(ref, newvar, True)
+            # alpha convert any ref that is in both 'first' and 'second' in 'second' to prevent collision
+            second = second.substitute(dict((ref, DrtVariableExpression(unique_variable(ref)))
+                for ref in set(first.get_refs(True)) & set(second.get_refs(True))), True)
             
             #DRS type is derived from the first member or from the second one
             drs_type = first.__class__ if isinstance(first, PresuppositionDRS) else second.__class__
@@ -721,14 +2141,19 @@ class ConcatenationDRS(DrtBooleanExpression, drt.ConcatenationDRS):
             return self.__class__(first, second)
 
 class DrtApplicationExpression(AbstractDrs, drt.DrtApplicationExpression):
-    
-    def fol(self):
+    __slots__ = ('function', 'argument')
+
+    def _fol(self, parts):
         if self.is_propername():
-            return EqualityExpression(self.function.fol(),
-                                      self.argument.fol())
-                 
-        else: return ApplicationExpression(self.function.fol(),
-                                           self.argument.fol())
+            return FolEqualityExpression(*parts)
+        else:
+            return FolApplicationExpression(*parts)
+
+    def _join_free(self, indvar_only, parts):
+        # the free variables of a predication are those of its arguments
+        if isinstance(self.function, AbstractVariableExpression):
+            return parts[1]
+        return parts[0] | parts[1]
 
     def is_propername(self):
         """
@@ -741,30 +2166,47 @@ class DrtApplicationExpression(AbstractDrs, drt.DrtApplicationExpression):
         return isinstance(self.function, DrtConstantExpression) and\
         self.function.variable.name.istitle()
 
-    def readings(self, trail=[]):
-        function_readings = self.function.readings(trail + [self])
-        if function_readings:
-            return function_readings
-        else:
-            return self.argument.readings(trail + [self])
+    def _hash(self, bound, level=0):
+        return hash((DrtApplicationExpression, self.function._hash(bound, level), self.argument._hash(bound, level)))
 
-    def deepcopy(self, operations=[]):
-        return self.__class__(self.function.deepcopy(operations), self.argument.deepcopy(operations))
+    def _key(self, labels, level):
+        return (DrtApplicationExpression.__name__, self.function._key(labels, level), self.argument._key(labels, level))
+
+    def children(self):
+        return (self.function, self.argument)
+
+    def _simplify(self, parts):
+        """
+        @see: AbstractDrs._simplify()
+        Most applications met in putting meanings together are not redexes
+        but predications of variables and constants, which simplify to
+        themselves: they are kept rather than built again. The term of a
+        simplified lambda is simplified, and putting a variable or a constant
+        in it makes no new redex, so only other arguments are simplified
+        again after the reduction.
+        """
+        function, argument = parts
+        if isinstance(function, LambdaExpression):
+            reduced = function.term.replace(function.variable, argument)
+            if isinstance(argument, DrtAbstractVariableExpression):
+                return reduced
+            return reduced.simplify()
+        if function is self.function and argument is self.argument:
+            return self
+        return self.__class__(function, argument)
 
 class DrtEventualityApplicationExpression(DrtApplicationExpression):
     """application expression with state or event argument"""
     pass
 
 class PresuppositionDRS(DRS):
-        
-    def readings(self, trail=[]):
-        inner_readings = DRS.readings(self, trail)
-        if inner_readings:
-            return inner_readings
-        else:
-            self._init_presupp_data()
-            return self._presupposition_readings(trail)
-        
+    # set by _init_presupp_data
+    __slots__ = ('variable', 'features', 'function_name', 'cond')
+
+    def _readings(self, trail):
+        self._init_presupp_data()
+        return self._presupposition_readings(trail)
+
     def _find_outer_drs(self, trail):
         for expr in trail:
             if expr.__class__ is DRS:
@@ -789,20 +2231,18 @@ class PresuppositionDRS(DRS):
         if collect_event_data:
             event_data_map = {}
             event_strings_map = {}
-        is_bindable = True # do not allow forward binding
         for drs in (expr for expr in trail if filter(expr)):
-            for cond in drs.conds:
-                # Ignore conditions following the presupposition DRS
-                if cond is self:
-                    if not collect_event_data: 
-                        break # assuming that the filtered_trail has drss ordered from the outermost to the innermost
-                if not isinstance(cond, DrtApplicationExpression):
-                    continue 
-                    is_bindable = False 
-                if is_bindable and self.is_possible_binding(cond): 
+            index = drs.antecedent_index(self.collect_event_data)
+            # Ignore conditions following the presupposition DRS
+            limit = None if collect_event_data else index.position(drs, self)
+            for position in index.candidates:
+                if limit is not None and position > limit:
+                    break # assuming that the filtered_trail has drss ordered from the outermost to the innermost
+                cond = drs.conds[position]
+                if self.is_possible_binding(cond): 
                     bindings.append(cond)
-                if collect_event_data:
-                    self.collect_event_data(cond, event_data_map, event_strings_map, individuals)
+            if collect_event_data:
+                index.merge(event_data_map, event_strings_map, individuals)
         if collect_event_data:
             self._enrich_event_data_map(event_data_map, event_strings_map)
         return (bindings, event_data_map) if collect_event_data else bindings
@@ -830,6 +2270,31 @@ class PresuppositionDRS(DRS):
                 
     def is_presupposition_cond(self, cond):
         return True
+
+    # How far the eventualities that the presupposition referent
+    # and its antecedents take part in affect the readings 
+    EVENT_DEPTH = 1
+
+    def footprint(self, trail):
+        """
+        Return the set of variables that the readings of this presupposition
+        depend on or change: its own variables, the referents of all its
+        possible antecedents and the eventualities they take part in.
+        """
+        bindings, event_data = self.find_bindings(trail, True, filter=lambda x: isinstance(x, DRS))
+        footprint = set(self.get_refs(True)) | self.free()
+        footprint.update(cond.argument.variable for cond in bindings)
+        for depth in range(self.EVENT_DEPTH):
+            footprint.update([event.variable for variable in footprint for event, role, event_string in event_data.get(variable, ())])
+        return footprint
+
+    def binds_any(self, conds):
+        """Check whether any of the given conditions could be an antecedent of this presupposition"""
+        return any(self.is_possible_binding(cond) for cond in conds)
+
+    def is_atemporal(self):
+        """Check whether all referents and free variables of this DRS are individuals"""
+        return all(is_indvar(variable.name) for variable in set(self.get_refs(True)) | self.free())
         
     def _init_presupp_data(self):
         presupp_cond_list = [cond for cond in self.conds if is_unary_predicate(cond) and cond.argument.variable == self.refs[0] and self.is_presupposition_cond(cond)]
@@ -874,10 +2339,12 @@ class PresuppositionDRS(DRS):
     
     class Operation(object):
         """An interface for all operations"""
+        __slots__ = ()
         def __call__(self, drs):
             raise NotImplementedError
     
     class Accommodate(Operation):
+        __slots__ = ('presupp_drs', 'condition_index')
         def __init__(self, presupp_drs, condition_index):
             # We need the condition index so that the conditions are not just appended to the list of conditions of the DRS,
             # but inserted where the presuppositional DRS had been. The order of conditions is important, because it reflects
@@ -893,9 +2360,15 @@ class PresuppositionDRS(DRS):
                 drs.conds.extend(self.presupp_drs.conds)
             else:
                 drs.conds = drs.conds[:self.condition_index + 1] + self.presupp_drs.conds + drs.conds[self.condition_index + 1:]
+            drs.invalidate()
             return drs
+        def position(self):
+            return self.condition_index
+        def shifted(self, offset):
+            return self.__class__(self.presupp_drs, self.condition_index + offset)
     
     class Bind(Operation):
+        __slots__ = ('presupp_drs', 'presupp_variable', 'presupp_funcname', 'antecedent_cond', 'condition_index')
         def __init__(self, presupp_drs, presupp_variable, presupp_funcname, antecedent_cond, condition_index):
             self.presupp_drs = presupp_drs
             self.presupp_variable = presupp_variable
@@ -917,9 +2390,15 @@ class PresuppositionDRS(DRS):
                 drs.conds.extend(conds_to_move)
             else:
                 drs.conds = drs.conds[:self.condition_index + 1] + conds_to_move + drs.conds[self.condition_index + 1:]
+            drs.invalidate()
             return drs
+        def position(self):
+            return self.condition_index
+        def shifted(self, offset):
+            return self.__class__(self.presupp_drs, self.presupp_variable, self.presupp_funcname, self.antecedent_cond, self.condition_index + offset)
             
     class InnerReplace(Operation):
+        __slots__ = ('presupp_variable', 'antecedent_ref')
         def __init__(self, presupp_variable, antecedent_ref):
             self.presupp_variable = presupp_variable
             self.antecedent_ref = antecedent_ref
@@ -929,13 +2408,16 @@ class PresuppositionDRS(DRS):
                 return drs.replace(self.presupp_variable, self.antecedent_ref, True)
 
     class MoveTemporalConditions(Operation):
+        __slots__ = ('temporal_conditions',)
         def __init__(self, temporal_conditions):
             self.temporal_conditions = temporal_conditions
         def __call__(self, drs):
                 drs.conds.extend(self.temporal_conditions)
+                drs.invalidate()
                 return drs
             
     class DoMultipleOperations(Operation):
+        __slots__ = ('operations_list',)
         def __init__(self, operations_list):
             self.operations_list = operations_list
             
@@ -945,9 +2427,15 @@ class PresuppositionDRS(DRS):
                 drs = operation(drs)
             return drs
                 
+    def _without(self, conds):
+        """Return this DRS without the given conditions, which are moved on their own"""
+        if not conds:
+            return self
+        return self.__class__(self.refs, [cond for cond in self.conds if not any(cond is other for other in conds)])
+
     def binding_reading(self, inner_drs, target_drs, antecedent_cond, trail, temporal_conditions=None, local_drs=None):
         condition_index = self._get_condition_index(target_drs, trail)
-        binder = self.Bind(self, self.variable, self.function_name, antecedent_cond, condition_index)
+        binder = self.Bind(self._without(temporal_conditions), self.variable, self.function_name, antecedent_cond, condition_index)
         inner_replacer = self.InnerReplace(self.variable, antecedent_cond.argument)
         temp_cond_mover = self.MoveTemporalConditions(temporal_conditions) if temporal_conditions else None
         if inner_drs is target_drs:
@@ -977,7 +2465,7 @@ class PresuppositionDRS(DRS):
     
     def accommodation_reading(self, target_drs, trail, temporal_conditions=None, local_drs=None, reading_type=Binding):
         condition_index = self._get_condition_index(target_drs, trail)
-        accommodator = self.Accommodate(self, condition_index)
+        accommodator = self.Accommodate(self._without(temporal_conditions), condition_index)
         if temporal_conditions:
             temp_cond_mover = self.MoveTemporalConditions(temporal_conditions)
             if local_drs is target_drs:
@@ -993,6 +2481,8 @@ class PronounDRS(PresuppositionDRS):
     A class for DRSs for personal, reflexive, and possessive pronouns
     """
     PRONOUNS = [DrtTokens.PRONOUN, DrtTokens.REFLEXIVE_PRONOUN, DrtTokens.POSSESSIVE_PRONOUN]
+    # The eventualities of the pronoun are extended with the ones they take part in
+    EVENT_DEPTH = 2
 
     def is_presupposition_cond(self, cond):
         return cond.function.variable.name in PronounDRS.PRONOUNS
@@ -1050,6 +2540,7 @@ class PronounDRS(PresuppositionDRS):
             return True
 
 class ProperNameDRS(PresuppositionDRS):
+    EVENT_DEPTH = 0
 
     def _presupposition_readings(self, trail=[]):
         """A proper name always has one reading: it is either global binding 
@@ -1080,8 +2571,7 @@ class DefiniteDescriptionDRS(PresuppositionDRS):
         presupp_event_strings = {}
         presupp_individuals = {}
         # Are there any states/events in this presuppositional DRS that the presupposition referent takes part in?
-        for cond in (c for c in self.conds if isinstance(c, DrtApplicationExpression)):
-            self.collect_event_data(cond, presupp_event_data, presupp_event_strings, presupp_individuals)
+        self.antecedent_index(self.collect_event_data).merge(presupp_event_data, presupp_event_strings, presupp_individuals)
         self._enrich_event_data_map(presupp_event_data, presupp_event_strings)
         
         possible_bindings = {}
@@ -1212,8 +2702,379 @@ class DefiniteDescriptionDRS(PresuppositionDRS):
                     return False
         return True
 
+class DiscourseBuilder(object):
+    """
+    Accumulates the DRSs of the sentences of a discourse. Appending a DRS
+    gives the same discourse as C{(discourse + drs).simplify()}, but costs
+    only as much as the new DRS: the referents of the discourse are kept in a
+    set to find collisions with, and the discourse is not simplified again.
+    """
+    def __init__(self, drs=None):
+        """
+        @param drs: C{AbstractDrs} the discourse to start from, if any
+        """
+        self.refs = []
+        self.conds = []
+        # referents bound anywhere in the discourse
+        self.bound = set()
+        self.drs_class = None
+        # the discourse if it is not a DRS, which can not be extended in place
+        self.expression = None
+        self._drs = None
+        if drs is not None:
+            self._load(drs)
+
+    def _load(self, drs):
+        self._drs = None
+        if isinstance(drs, DRS):
+            self.refs = list(drs.refs)
+            self.conds = list(drs.conds)
+            self.bound = set(drs.get_refs(True))
+            self.drs_class = drs.__class__
+            self.expression = None
+        else:
+            self.expression = drs
+
+    def __nonzero__(self):
+        return self.drs_class is not None or self.expression is not None
+
+    def copy(self):
+        """Return a builder of the discourse so far, which can be appended to independently of this one"""
+        builder = DiscourseBuilder()
+        builder.refs = list(self.refs)
+        builder.conds = list(self.conds)
+        builder.bound = set(self.bound)
+        builder.drs_class = self.drs_class
+        builder.expression = self.expression
+        builder._drs = self._drs
+        return builder
+
+    def append(self, expression):
+        """
+        Add the DRS of a new sentence to the end of the discourse.
+        @param expression: C{AbstractDrs}
+        """
+        expression = expression.simplify()
+        if not self:
+            self._load(expression)
+        elif self.expression is not None or not isinstance(expression, DRS):
+            self._load((self.drs() + expression).simplify())
+        else:
+            # alpha convert any ref that is already in the discourse to prevent collision
+            clashes = set(expression.get_refs(True)) & self.bound
+            if clashes:
+                expression = expression.substitute(dict((ref, DrtVariableExpression(unique_variable(ref)))
+                    for ref in clashes), True)
+            self.bound.update(expression.get_refs(True))
+            self.refs.extend(expression.refs)
+            self.conds.extend(expression.conds)
+            #DRS type is derived from the first member or from the second one
+            if not issubclass(self.drs_class, PresuppositionDRS):
+                self.drs_class = expression.__class__
+            self._drs = None
+
+    def drs(self):
+        """
+        Return the discourse so far, or C{None} if nothing has been added.
+        @return: C{AbstractDrs}
+        """
+        if self.expression is not None:
+            return self.expression
+        if self._drs is None and self.drs_class is not None:
+            self._drs = self.drs_class(list(self.refs), list(self.conds))
+        return self._drs
+
+# The syntax trees of the DRS reader of DrtParser. Every node is a tuple
+# that starts with its kind:
+#
+#   VARIABLE     name, feature names, arguments
+#   APPLICATION  function, arguments
+#   NEGATION     term
+#   LAMBDA       variable names, term
+#   DRS          referent names, conditions, presupposition token or None
+#   EQUALITY     first, second, negated
+#   BOOLEAN      operator, first, second
+_VARIABLE, _APPLICATION, _NEGATION, _LAMBDA, _DRS, _EQUALITY, _BOOLEAN = range(7)
+
+class _Unreadable(Exception):
+    """The DRS reader does not take on the string, the generic parser does"""
+
+_symbol_tables = {}
+
+def _symbol_table(symbols):
+    """
+    Return the trie of the symbols and the pattern of the runs of characters
+    that neither start a symbol nor are whitespace.
+    @param symbols: C{list} of C{str}
+    @return: C{tuple} of C{dict} and the compiled pattern
+    """
+    key = tuple(symbols)
+    try:
+        return _symbol_tables[key]
+    except KeyError:
+        trie = {}
+        for symbol in symbols:
+            node = trie
+            for c in symbol:
+                node = node.setdefault(c, {})
+            # None marks the end of a symbol
+            node[None] = True
+        plain = re.compile(r"[^ \t\n%s]+" % re.escape("".join(trie)))
+        table = _symbol_tables[key] = (trie, plain)
+        return table
+
+# the classes of parsers the DRS reader can be used for
+_readable = {}
+
 class DrtParser(drt.DrtParser):
-    
+
+    # the classes of the DRSs of the presupposition triggers
+    PRESUPPOSITION_DRSS = {
+     DrtTokens.PROPER_NAME_DRS : ProperNameDRS,
+     DrtTokens.DEFINITE_DESCRIPTION_DRS : DefiniteDescriptionDRS,
+     DrtTokens.PRONOUN_DRS : PronounDRS,
+    }
+
+    # the methods of the generic parser whose syntax the DRS reader follows;
+    # it is not used by subclasses that override any of them
+    READER_METHODS = ['process', 'get_all_symbols', 'isvariable', 'has_priority', 'parse_Expression', 'handle',
+                      'handle_PresuppositionDRS', 'handle_DRS', 'handle_variable', 'handle_negation', 'handle_lambda',
+                      'handle_open', 'get_next_token_variable', 'attempt_adjuncts', 'attempt_EqualityExpression',
+                      'attempt_ApplicationExpression', 'attempt_BooleanExpression']
+
+    def parse(self, data, signature=None):
+        """
+        Parse a DRS string. Strings of the DRT dialect are read by a
+        dedicated reader that decides on every token by table lookups,
+        without trying one handler after another and without exceptions
+        for lookahead. Anything it does not take on, such as first order
+        formulas or malformed strings, is left to the generic parser, so
+        that the expressions and the errors are the same either way.
+        @param data: C{str}
+        @param signature: C{dict} of types of variables for type checking
+        @return: C{AbstractDrs}
+        """
+        if not self.type_check and not self.quote_chars and self._reads_dialect():
+            try:
+                tokens = self._tokenize(data.rstrip())
+                tree, index = self._read_expression(tokens, 0, None)
+                if index == len(tokens):
+                    # nothing is made before the whole string has been read,
+                    # the generic parser would otherwise take fresh variables twice
+                    return self._build(tree)
+            except _Unreadable:
+                pass
+        return drt.DrtParser.parse(self, data, signature)
+
+    def _reads_dialect(self):
+        cls = self.__class__
+        try:
+            return _readable[cls]
+        except KeyError:
+            readable = _readable[cls] = all(getattr(cls, name).im_func is getattr(DrtParser, name).im_func
+                                            for name in self.READER_METHODS)
+            return readable
+
+    def _tokenize(self, data):
+        """Split the data into the tokens L{process} would, but a run of characters at a time"""
+        trie, plain = _symbol_table(self.get_all_symbols())
+        tokens = []
+        token = ''
+        index, length = 0, len(data)
+        while index < length:
+            match = plain.match(data, index)
+            if match:
+                token += match.group()
+                index = match.end()
+                continue
+            # take the longest way down the trie without backtracking, as process does
+            node, end = trie, index
+            while end < length and data[end] in node:
+                node = node[data[end]]
+                end += 1
+            if None in node:
+                if token:
+                    tokens.append(token)
+                    token = ''
+                tokens.append(data[index:end])
+                index = end
+            else:
+                if data[index] in ' \t\n':
+                    if token:
+                        tokens.append(token)
+                        token = ''
+                else:
+                    token += data[index]
+                index += 1
+        if token:
+            tokens.append(token)
+        return tokens
+
+    def _expect(self, tokens, index, expected):
+        if index < len(tokens) and tokens[index] == expected:
+            return index + 1
+        raise _Unreadable()
+
+    def _read_expression(self, tokens, index, context):
+        """Read an expression and its adjuncts like L{parse_Expression}, return its tree and the next index"""
+        if index == len(tokens):
+            raise _Unreadable()
+        tree, index = self._read_head(tokens, index + 1, tokens[index], context)
+        order = self.order_of_operations
+        while True:
+            start = index
+            if index < len(tokens):
+                tok = tokens[index]
+                if tok in DrtTokens.EQ + DrtTokens.NEQ and order[tok] < order[context]:
+                    second, index = self._read_expression(tokens, index + 1, tok)
+                    tree = (_EQUALITY, tree, second, tok in DrtTokens.NEQ)
+            if order['APP'] < order[context] and index < len(tokens) and tokens[index] == DrtTokens.OPEN:
+                # only lambda and application expressions take arguments
+                if not (tree[0] in (_LAMBDA, _APPLICATION) or (tree[0] == _VARIABLE and tree[3])):
+                    raise _Unreadable()
+                arguments, index = self._read_arguments(tokens, index + 1)
+                tree = (_APPLICATION, tree, arguments)
+            while index < len(tokens):
+                tok = tokens[index]
+                if self.get_BooleanExpression_factory(tok) and order[tok] < order[context]:
+                    second, index = self._read_expression(tokens, index + 1, tok)
+                    tree = (_BOOLEAN, tok, tree, second)
+                else:
+                    break
+            if index == start:
+                return tree, index
+
+    def _read_head(self, tokens, index, tok, context):
+        upper = tok.upper()
+        if upper in DrtTokens.PRESUPPOSITION_DRS:
+            return self._read_DRS(tokens, self._expect(tokens, index, DrtTokens.OPEN), context, upper)
+        elif tok in DrtTokens.NOT:
+            term, index = self._read_expression(tokens, index, DrtTokens.NOT[DrtTokens.NLTK])
+            return (_NEGATION, term), index
+        elif tok in DrtTokens.LAMBDA:
+            return self._read_lambda(tokens, index, tok)
+        elif tok == DrtTokens.OPEN:
+            if index < len(tokens) and tokens[index] == DrtTokens.OPEN_BRACKET:
+                return self._read_DRS(tokens, index, context, None)
+            tree, index = self._read_expression(tokens, index, None)
+            return tree, self._expect(tokens, index, DrtTokens.CLOSE)
+        elif upper == DrtTokens.DRS:
+            return self._read_DRS(tokens, self._expect(tokens, index, DrtTokens.OPEN), context, None)
+        elif tok not in DrtTokens.TOKENS:
+            return self._read_variable(tokens, index, tok)
+        raise _Unreadable()
+
+    def _read_name(self, tokens, index):
+        """Read the name of a bound variable, which must not be a constant"""
+        if index == len(tokens) or isinstance(self.make_VariableExpression(tokens[index]), ConstantExpression):
+            raise _Unreadable()
+        return tokens[index]
+
+    def _read_DRS(self, tokens, index, context, presupposition):
+        index = self._expect(tokens, index, DrtTokens.OPEN_BRACKET)
+        refs = []
+        while index < len(tokens) and tokens[index] != DrtTokens.CLOSE_BRACKET:
+            if refs and tokens[index] == DrtTokens.COMMA:
+                index += 1
+            refs.append(self._read_name(tokens, index))
+            index += 1
+        index = self._expect(tokens, index, DrtTokens.CLOSE_BRACKET)
+        if index < len(tokens) and tokens[index] == DrtTokens.COMMA:
+            index += 1
+        index = self._expect(tokens, index, DrtTokens.OPEN_BRACKET)
+        conds = []
+        while index < len(tokens) and tokens[index] != DrtTokens.CLOSE_BRACKET:
+            if conds and tokens[index] == DrtTokens.COMMA:
+                index += 1
+            cond, index = self._read_expression(tokens, index, context)
+            conds.append(cond)
+        index = self._expect(tokens, index, DrtTokens.CLOSE_BRACKET)
+        index = self._expect(tokens, index, DrtTokens.CLOSE)
+        return (_DRS, refs, conds, presupposition), index
+
+    def _read_lambda(self, tokens, index, tok):
+        names = [self._read_name(tokens, index)]
+        index += 1
+        while True:
+            if index == len(tokens) or (tokens[index] in DrtTokens.DOT and index + 1 == len(tokens)):
+                raise _Unreadable()
+            if tokens[index] in DrtTokens.TOKENS:
+                break
+            names.append(self._read_name(tokens, index))
+            index += 1
+        if tokens[index] in DrtTokens.DOT:
+            index += 1
+        term, index = self._read_expression(tokens, index, tok)
+        return (_LAMBDA, names, term), index
+
+    def _read_variable(self, tokens, index, tok):
+        features = []
+        if index < len(tokens) and tokens[index] == DrtTokens.OPEN_BRACE:
+            index += 1
+            while True:
+                # handle_variable keeps the features read so far if the input ends
+                if index == len(tokens):
+                    raise _Unreadable()
+                if tokens[index] == DrtTokens.CLOSE_BRACE:
+                    break
+                features.append(tokens[index])
+                index += 1
+                if index < len(tokens) and tokens[index] == DrtTokens.COMMA:
+                    index += 1
+            index += 1
+        arguments = []
+        if index < len(tokens) and tokens[index] == DrtTokens.OPEN:
+            if not features and isinstance(self.make_VariableExpression(tok), drt.DrtIndividualVariableExpression):
+                raise _Unreadable()
+            arguments, index = self._read_arguments(tokens, index + 1)
+        elif features:
+            # features without arguments are not made into a feature constant
+            raise _Unreadable()
+        return (_VARIABLE, tok, features, arguments), index
+
+    def _read_arguments(self, tokens, index):
+        argument, index = self._read_expression(tokens, index, 'APP')
+        arguments = [argument]
+        while index < len(tokens) and tokens[index] == DrtTokens.COMMA:
+            argument, index = self._read_expression(tokens, index + 1, 'APP')
+            arguments.append(argument)
+        return arguments, self._expect(tokens, index, DrtTokens.CLOSE)
+
+    def _build(self, tree):
+        """Make the expression of a tree with the hooks of the parser, in the order the generic parser does"""
+        kind = tree[0]
+        if kind == _VARIABLE:
+            expression = self.make_VariableExpression(tree[1])
+            if tree[2]:
+                expression = DrtFeatureConstantExpression(expression.variable,
+                                                          [DrtFeatureExpression(intern_variable(f)) for f in tree[2]])
+            for argument in tree[3]:
+                expression = self.make_ApplicationExpression(expression, self._build(argument))
+            return expression
+        elif kind == _APPLICATION:
+            expression = self._build(tree[1])
+            for argument in tree[2]:
+                expression = self.make_ApplicationExpression(expression, self._build(argument))
+            return expression
+        elif kind == _DRS:
+            drs = self.make_DRS([intern_variable(ref) for ref in tree[1]], [self._build(cond) for cond in tree[2]])
+            if tree[3]:
+                drs = self.PRESUPPOSITION_DRSS[tree[3]](drs.refs, drs.conds)
+            return drs
+        elif kind == _NEGATION:
+            return self.make_NegatedExpression(self._build(tree[1]))
+        elif kind == _LAMBDA:
+            expression = self._build(tree[2])
+            for name in reversed(tree[1]):
+                expression = self.make_LambdaExpression(intern_variable(name), expression)
+            return expression
+        elif kind == _EQUALITY:
+            expression = self.make_EqualityExpression(self._build(tree[1]), self._build(tree[2]))
+            return self.make_NegatedExpression(expression) if tree[3] else expression
+        else:
+            factory = self.get_BooleanExpression_factory(tree[1])
+            return self.make_BooleanExpression(factory, self._build(tree[2]), self._build(tree[3]))
+
     def get_all_symbols(self):
         return DrtTokens.SYMBOLS
 
@@ -1232,12 +3093,7 @@ class DrtParser(drt.DrtParser):
         """Parse all the Presuppositon DRSs."""
         self.assertNextToken(DrtTokens.OPEN)
         drs = self.handle_DRS(tok, context)
-        if tok == DrtTokens.PROPER_NAME_DRS:
-            return ProperNameDRS(drs.refs, drs.conds)
-        elif tok == DrtTokens.DEFINITE_DESCRIPTION_DRS:
-            return DefiniteDescriptionDRS(drs.refs, drs.conds)
-        elif tok == DrtTokens.PRONOUN_DRS:
-            return PronounDRS(drs.refs, drs.conds)
+        return self.PRESUPPOSITION_DRSS[tok](drs.refs, drs.conds)
 
     def handle_variable(self, tok, context):
         #It's either: 1) a predicate expression: sees(x,y)
@@ -1250,7 +3106,7 @@ class DrtParser(drt.DrtParser):
             if self.token(0) == DrtTokens.OPEN_BRACE:
                 self.token() # swallow the OPEN_BRACE
                 while self.token(0) != DrtTokens.CLOSE_BRACE:
-                    features.append(DrtFeatureExpression(Variable(self.token())))
+                    features.append(DrtFeatureExpression(intern_variable(self.token())))
                     if self.token(0) == drt.DrtTokens.COMMA:
                         self.token() # swallow the comma
                 self.token() # swallow the CLOSE_BRACE
@@ -1282,7 +3138,12 @@ class DrtParser(drt.DrtParser):
 
     def handle_DRS(self, tok, context):
         drs = drt.DrtParser.handle_DRS(self, tok, context)
-        return DRS(drs.refs, drs.conds)
+        return self.make_DRS(drs.refs, drs.conds)
+
+    def make_DRS(self, refs, conds):
+        """This method serves as a hook for other logic parsers that
+        have different DRS classes or add conditions to DRSs"""
+        return DRS(refs, conds)
     
     def get_BooleanExpression_factory(self, tok):
         """This method serves as a hook for other logic parsers that
@@ -1299,14 +3160,17 @@ class DrtParser(drt.DrtParser):
         else:
             return None
   
+    def get_next_token_variable(self, description):
+        return intern_variable(drt.DrtParser.get_next_token_variable(self, description).name)
+
     def make_VariableExpression(self, name):
-        return DrtVariableExpression(Variable(name))
+        return DrtVariableExpression(intern_variable(name))
 
     def make_ApplicationExpression(self, function, argument):
         return DrtApplicationExpression(function, argument)
     
     def make_ConstantExpression(self, name):
-        return DrtConstantExpression(Variable(name))
+        return DrtConstantExpression(intern_variable(name))
 
     def make_NegatedExpression(self, expression):
         return DrtNegatedExpression(expression)
@@ -0,0 +1,251 @@
+"""
+Compact binary encoding of DRT expressions
+"""
+
+__author__ = "Alex Kislev, Emma Li, Peter Makarov"
+__version__ = "1.0"
+__date__ = "Tue, 24 Aug 2010"
+
+import copy_reg
+import presuppdrt as drt
+import temporaldrt
+from presuppdrt import intern_variable
+
+# An encoded expression is the magic string, a table of the variable names it
+# uses and the expression itself in prefix order. Every node starts with the
+# tag of its class; what follows depends on the kind of the class:
+#
+#   LEAF      name
+#   FEATURES  name, number of features, features
+#   LAMBDA    name, term
+#   DRS       number of referents, referent names, number of conditions, conditions
+#   UNARY     term
+#   BINARY    first, second
+#
+# All numbers, including tags and name indices, are unsigned LEB128 integers,
+# so that most of them take a single byte.
+
+MAGIC = "DRT\x01"
+
+LEAF, FEATURES, LAMBDA, DRS, UNARY, BINARY = range(6)
+
+class SerializationException(Exception):
+    pass
+
+_tags = {}
+_classes = {}
+
+def register(cls, tag):
+    """
+    Make a class serializable. Its instances are pickled in this encoding
+    too, which keeps pickles small and restores interned leaves. Tags are
+    part of the format and must never be reused or changed once data has
+    been written with them.
+    @param cls: C{AbstractDrs} subclass
+    @param tag: C{int} unique to the class
+    """
+    assert tag not in _classes or _classes[tag][0] is cls, "Tag %s is already taken by %s" % (tag, _classes[tag][0].__name__)
+    if issubclass(cls, drt.DrtFeatureConstantExpression):
+        kind = FEATURES
+    elif issubclass(cls, drt.DrtAbstractVariableExpression):
+        kind = LEAF
+    elif issubclass(cls, drt.DrtLambdaExpression):
+        kind = LAMBDA
+    elif issubclass(cls, drt.DRS):
+        kind = DRS
+    elif issubclass(cls, drt.DrtNegatedExpression):
+        kind = UNARY
+    else:
+        kind = BINARY
+    _tags[cls] = (tag, kind)
+    _classes[tag] = (cls, kind)
+    copy_reg.pickle(cls, _reduce)
+
+def _reduce(expression):
+    return loads, (dumps(expression),)
+
+for tag, cls in [
+    (1, drt.DRS),
+    (2, drt.PresuppositionDRS),
+    (3, drt.PronounDRS),
+    (4, drt.ProperNameDRS),
+    (5, drt.DefiniteDescriptionDRS),
+    (10, drt.DrtAbstractVariableExpression),
+    (11, drt.DrtIndividualVariableExpression),
+    (12, drt.DrtFunctionVariableExpression),
+    (13, drt.DrtEventVariableExpression),
+    (14, drt.DrtTimeVariableExpression),
+    (15, drt.DrtStateVariableExpression),
+    (16, drt.DrtConstantExpression),
+    (17, drt.DrtUtterVariableExpression),
+    (18, drt.DrtFeatureExpression),
+    (19, drt.DrtFeatureConstantExpression),
+    (20, drt.DrtProperNameExpression),
+    (30, drt.DrtNegatedExpression),
+    (31, drt.DrtLambdaExpression),
+    (32, drt.DrtOrExpression),
+    (33, drt.DrtImpExpression),
+    (34, drt.DrtIffExpression),
+    (35, drt.DrtEqualityExpression),
+    (36, drt.ConcatenationDRS),
+    (37, drt.DrtApplicationExpression),
+    (38, drt.DrtEventualityApplicationExpression),
+    (50, temporaldrt.NewInfoDRS),
+    (51, temporaldrt.PresuppositionDRS),
+    (52, temporaldrt.DefiniteDescriptionDRS),
+    (60, temporaldrt.DrtTimeApplicationExpression),
+    (61, temporaldrt.DrtLocationTimeApplicationExpression),
+    (62, temporaldrt.DrtFindUtterTimeExpression),
+    (63, temporaldrt.DrtFindEventualityExpression),
+    ]:
+    register(cls, tag)
+
+def _write_number(out, number):
+    while number > 0x7f:
+        out.append((number & 0x7f) | 0x80)
+        number >>= 7
+    out.append(number)
+
+def dumps(expression):
+    """
+    Encode an expression. Equal encodings mean equal expressions, so the
+    result can also be used as a dictionary key.
+    @param expression: C{AbstractDrs}
+    @return: C{str}
+    """
+    names = {}
+    body = bytearray()
+
+    def write_name(variable):
+        index = names.get(variable.name)
+        if index is None:
+            index = names[variable.name] = len(names)
+        _write_number(body, index)
+
+    # the nodes are written in prefix order, so there is no need to recurse
+    agenda = [expression]
+    while agenda:
+        e = agenda.pop()
+        try:
+            tag, kind = _tags[e.__class__]
+        except KeyError:
+            raise SerializationException("Cannot serialize %s" % e.__class__.__name__)
+        _write_number(body, tag)
+        if kind == LEAF:
+            write_name(e.variable)
+            continue
+        if kind == DRS:
+            _write_number(body, len(e.refs))
+            for ref in e.refs:
+                write_name(ref)
+            _write_number(body, len(e.conds))
+        elif kind == LAMBDA:
+            write_name(e.variable)
+        elif kind == FEATURES:
+            write_name(e.variable)
+            _write_number(body, len(e.features))
+            agenda.extend(reversed(e.features))
+            continue
+        agenda.extend(reversed(e.children()))
+
+    header = bytearray(MAGIC)
+    _write_number(header, len(names))
+    for name, index in sorted(names.items(), key=lambda item: item[1]):
+        _write_number(header, len(name))
+        header.extend(name)
+    return str(header + body)
+
+def loads(data):
+    """
+    Decode an expression encoded with L{dumps}.
+    @param data: C{str}, C{bytearray}, C{buffer} or C{memoryview}
+    @return: C{AbstractDrs}
+    """
+    expression, offset = decode(memoryview(data))
+    if offset != len(data):
+        raise SerializationException("Trailing data after the expression at offset %s" % offset)
+    return expression
+
+def decode(view, offset=0):
+    """
+    Decode one expression from a buffer without copying it, so that several
+    encodings can be read one after another out of a single block of memory.
+    @param view: C{memoryview} of the encoded data
+    @param offset: C{int} the position of the encoding in the view
+    @return: C{tuple} of the expression and the offset just after it
+    """
+    if view[offset:offset + len(MAGIC)].tobytes() != MAGIC:
+        raise SerializationException("Not an encoded expression at offset %s" % offset)
+    position = [offset + len(MAGIC)]
+
+    def read_number():
+        i = position[0]
+        number = ord(view[i])
+        i += 1
+        if number > 0x7f:
+            number &= 0x7f
+            shift = 7
+            while True:
+                byte = ord(view[i])
+                i += 1
+                number |= (byte & 0x7f) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+        position[0] = i
+        return number
+
+    variables = []
+    for _ in xrange(read_number()):
+        length = read_number()
+        start = position[0]
+        position[0] = start + length
+        variables.append(intern_variable(view[start:start + length].tobytes()))
+
+    # frames of the nodes whose subexpressions are still being read:
+    # (class, kind, variable or referents, number of subexpressions, subexpressions)
+    stack = []
+    try:
+        while True:
+            cls, kind = _classes[read_number()]
+            if kind == LEAF:
+                value = cls(variables[read_number()])
+            else:
+                if kind == DRS:
+                    head = [variables[read_number()] for _ in xrange(read_number())]
+                    count = read_number()
+                elif kind == BINARY:
+                    head, count = None, 2
+                elif kind == UNARY:
+                    head, count = None, 1
+                elif kind == LAMBDA:
+                    head, count = variables[read_number()], 1
+                else:
+                    head = variables[read_number()]
+                    count = read_number()
+                if count:
+                    stack.append((cls, kind, head, count, []))
+                    continue
+                value = _build(cls, kind, head, [])
+
+            while stack:
+                parts = stack[-1][4]
+                parts.append(value)
+                if len(parts) < stack[-1][3]:
+                    break
+                cls, kind, head, count, parts = stack.pop()
+                value = _build(cls, kind, head, parts)
+            else:
+                return value, position[0]
+    except (KeyError, IndexError), e:
+        raise SerializationException("Corrupt encoding at offset %s: %s" % (position[0], e))
+
+def _build(cls, kind, head, parts):
+    if kind == DRS:
+        return cls(head, parts)
+    elif kind == LAMBDA:
+        return cls(head, parts[0])
+    elif kind == FEATURES:
+        return cls(head, parts)
+    else:
+        return cls(*parts)
@@ -24,6 +24,7 @@ from presuppdrt import ConditionRemover
 from presuppdrt import DrtEqualityExpression
 from presuppdrt import DrtConstantExpression
 from presuppdrt import unique_variable
+from presuppdrt import intern_variable
 from presuppdrt import DrtNegatedExpression
 from presuppdrt import is_statevar
 from presuppdrt import is_eventvar
@@ -72,7 +73,10 @@ class LocationTimeResolutionException(Exception):
 class DrtLocationTimeApplicationExpression(DrtTimeApplicationExpression):
     """LOCPRO(t) condition from a non-finite verb. Gets resolved 
     to the closest location time referent introduced by a finite auxiliary. """
-    def readings(self, trail=[]):
+    def _resolution_parts(self, trail):
+        return ()
+
+    def _readings(self, trail):
         utter_time_search = False
 
         for drs in (ancestor for ancestor in ReverseIterator(trail) if isinstance(ancestor, DRS)):
@@ -106,7 +110,10 @@ class DrtLocationTimeApplicationExpression(DrtTimeApplicationExpression):
 
 class DrtFindUtterTimeExpression(DrtApplicationExpression):
     """Type of application expression looking to equate its argument with utterance time"""
-    def readings(self, trail=[]):
+    def _resolution_parts(self, trail):
+        return ()
+
+    def _readings(self, trail):
         for ancestor in trail:    
             for ref in ancestor.get_refs():
                 refex = DrtVariableExpression(ref)
@@ -136,7 +143,10 @@ class DrtFindEventualityExpression(DrtApplicationExpression):
     e* = end(s) and adds a new event referent e*. Note that end(.) is an operator on states
     that returns events."""
     
-    def readings(self, trail=[]):
+    def _resolution_parts(self, trail):
+        return ()
+
+    def _readings(self, trail):
 
         state_reference_point = None
         index = trail[-1].conds.index(self)
@@ -219,7 +229,7 @@ class DrtFindEventualityExpression(DrtApplicationExpression):
             return [Binding([(trail[-1], ConditionRemover(index))])], False
 
     def make_ConstantExpression(self, name):
-        return DrtConstantExpression(Variable(name))
+        return DrtConstantExpression(intern_variable(name))
     
     def _combine(self, cond, arg1, arg2):
         """Combines two arguments into a DrtEventualityApplicationExpression
@@ -255,7 +265,8 @@ class DefiniteDescriptionDRS(drt.DefiniteDescriptionDRS):
         free = self.free(True)
         temporal_conditions = []
         # If there are free variables that stem from conditions like 'overlap', earlier', 'include',
-        # those conditions will be moved to the local DRS
+        # those conditions will be moved to the local DRS (the readings leave them out of the
+        # presupposition DRS, which itself is not changed)
         for cond in self.conds:
             
             if isinstance(cond, DrtTimeApplicationExpression) and isinstance(cond.function, DrtTimeApplicationExpression):
@@ -272,23 +283,16 @@ class DefiniteDescriptionDRS(drt.DefiniteDescriptionDRS):
                     if expression_variable in free:
                         free.remove(expression_variable)
                 temporal_conditions.append(cond)
-                self.conds.remove(cond)
         return free, temporal_conditions
 
 class DrtParser(drt.DrtParser):
     """DrtParser producing conditions and referents for temporal logic"""
 
-    def handle_PresuppositionDRS(self, tok, context):
-        """Parse all the Presuppositon DRSs"""
-        if tok == DrtTokens.DEFINITE_DESCRIPTION_DRS:
-            self.assertNextToken(DrtTokens.OPEN)
-            drs = self.handle_DRS(tok, context)
-            return DefiniteDescriptionDRS(drs.refs, drs.conds)
-        else:
-            return drt.DrtParser.handle_PresuppositionDRS(self, tok, context)
+    PRESUPPOSITION_DRSS = dict(drt.DrtParser.PRESUPPOSITION_DRSS)
+    PRESUPPOSITION_DRSS[DrtTokens.DEFINITE_DESCRIPTION_DRS] = DefiniteDescriptionDRS
 
-    def handle_DRS(self, tok, context):
-        drs = drt.DrtParser.handle_DRS(self, tok, context)
+    def make_DRS(self, refs, conds):
+        drs = drt.DrtParser.make_DRS(self, refs, conds)
         location_time = None
         
         for cond in drs.conds:
@@ -350,7 +354,7 @@ class DrtParser(drt.DrtParser):
         return DRS(drs.refs, drs.conds)
   
     def make_VariableExpression(self, name):
-        return DrtVariableExpression(Variable(name))
+        return DrtVariableExpression(intern_variable(name))
 
     def make_ApplicationExpression(self, function, argument):
         if isinstance(function, DrtAbstractVariableExpression) and \
@@ -5,8 +5,15 @@ __author__ = "Alex Kislev, Emma Li, Peter Makarov"
 __version__ = "1.0"
 __date__ = "Tue, 24 Aug 2010"
 
-from util import Tester
+import json
+from StringIO import StringIO
+import batch
+import serialize
+import temporaldrt
+from util import Tester, Tokenizer, SentenceCache
 from wntemporaldrt import DrtParser
+from presuppdrt import DRS, DrtNegatedExpression, DrtVariableExpression, VariableAllocator, unique_variable
+from nltk.sem.logic import LogicParser, Variable
 
 #background knowledge
 BK = {
@@ -238,6 +245,224 @@ def test_inference(tester):
 
     tester.inference_test(cases_inf, BK, verbose=False)
 
+class CaseCollector(object):
+    """Stands in for the tester to collect the cases of the suites above"""
+    def __init__(self):
+        self.cases = []
+
+    def test(self, cases, **args):
+        self.cases.extend(cases)
+
+    def inference_test(self, cases, bk, verbose=False):
+        pass
+
+def expected_readings():
+    """Return the readings expected by the suites above, as they are printed"""
+    collector = CaseCollector()
+    for test in (test_anaphora, test_presupposition, test_tenses):
+        test(collector)
+    readings = []
+    for number, sentence, expected in collector.cases:
+        if expected:
+            for drs in expected if isinstance(expected, list) else [expected]:
+                readings.append(drs[len("DRS"):] if drs.startswith("DRS") else drs)
+    return readings
+
+# the depth of the nested expression test_traversals checks
+DEEP_NESTING = 3000
+
+def test_traversals(tester):
+    parse = tester.presupp_parser.parse
+    logic_parser = LogicParser()
+
+    #the readings are printed, copied and simplified as they are written
+    readings = [(number, drs, drs) for number, drs in enumerate(expected_readings(), 1)]
+    tester.output_test(readings, parse)
+    tester.output_test(readings, lambda drs: parse(drs).deepcopy())
+    tester.output_test(readings, lambda drs: parse(drs).simplify())
+
+    #their first order translations are read back by nltk as they are printed
+    def read_back(drs):
+        fol = parse(drs).fol()
+        return logic_parser.parse(str(fol)) == fol and str(logic_parser.parse(str(fol))) == str(fol)
+    tester.output_test([(number, drs, True) for number, drs, expected in readings], read_back)
+
+    cases_fol = [
+    (1, r"\x.([],[walk(x)])(z)", r"\x.walk(x)(z)"),
+
+    (2, "(([x],[man(x)]) + ([x],[walk(x)]))", "(exists x.(man(x) & individual(x)) & exists x.(walk(x) & individual(x)))"),
+
+    (3, "(([x],[man(x)]) -> ([x],[walk(x)]))", "all x.(man(x) -> exists x.(walk(x) & individual(x)))"),
+
+    (4, r"\P.(([x],[man(x)]) + P(x))(\y.([],[walk(y)]))", r"\P.(exists x.(man(x) & individual(x)) & P(x))(\y.walk(y))"),
+
+    (5, "([x],[man(x), PRON([u],[PRO{sg,m}(u)]), see(x,u)])", "exists x.(((man(x) & exists u.(PRO(u) & individual(u))) & see(x,u)) & individual(x))"),
+
+    (6, "([x],[-([y],[walk(y)]), (([],[man(x)]) | ([],[woman(x)]))])", "exists x.((-exists y.(walk(y) & individual(y)) & (man(x) | woman(x))) & individual(x))"),
+
+    (7, "([n,x],[Mary{sg,f}(x), (([s],[like(s), AGENT(s,x)]) -> ([],[smile(x)]))])", "exists n.(exists x.(((Mary = x) & all s.((like(s) & AGENT(s,x)) -> smile(x))) & individual(x)) & time(n))"),
+
+    (8, "([e,x],[walk(e), AGENT(e,x), (x = y)])", "exists e.(exists x.(((walk(e) & AGENT(e,x)) & (x = y)) & individual(x)) & event(e))"),
+    ]
+
+    cases_simplify = [
+    (1, r"\x.([],[walk(x)])(z)", "([],[walk(z)])"),
+
+    (2, "(([x],[man(x)]) + ([x],[walk(x)]))", "([x,z0101],[man(x), walk(z0101)])"),
+
+    (3, "(([x],[man(x)]) -> ([x],[walk(x)]))", "(([x],[man(x)]) -> ([z0101],[walk(z0101)]))"),
+
+    (4, r"\x.([y],[see(x,y)])(y)", "([z0101],[see(y,z0101)])"),
+
+    (5, r"\P.(([x],[man(x)]) + P(x))(\y.([],[walk(y)]))", "([x],[man(x), walk(x)])"),
+
+    (6, "(([x],[man(x)]) + PRON([u],[PRO{sg,m}(u)]))", "([x,u],[man(x), PRO{sg,m}(u)])"),
+
+    (7, r"\Q.\x.(Q(x) + ([y],[see(x,y)]))(\z.([y],[man(z,y)]))(y)", "([z0102,z0101],[man(y,z0102), see(y,z0101)])"),
+    ]
+
+    tester.output_test(cases_fol, lambda drs: parse(drs).fol())
+    tester.output_test(cases_simplify, lambda drs: parse(drs).simplify())
+
+    #expressions nested deeper than the recursion limit
+    def nested(drs):
+        for i in range(DEEP_NESTING):
+            drs = DRS([], [DrtNegatedExpression(drs)])
+        return drs
+    inner = "([x],[man(x)])"
+    deep = nested(parse(inner))
+    deep_str = "([],[-" * DEEP_NESTING + inner + "])" * DEEP_NESTING
+
+    #a pronoun under the negations is bound by a name outside them
+    name = parse("([x],[John{sg,m}(x)])")
+    discourse = DRS(name.refs, name.conds + [nested(parse("([u],[PRON([v],[PRO{sg,m}(v)]), see(u,v)])"))])
+    resolved_str = "([x],[John{sg,m}(x), " + "([],[-" * DEEP_NESTING + "([u],[see(u,x)])" + "])" * DEEP_NESTING + "])"
+
+    checks = [
+    ("str", lambda: str(deep) == deep_str),
+    ("fol", lambda: str(deep.fol()) == "-" * DEEP_NESTING + "exists x.(man(x) & individual(x))"),
+    ("deepcopy", lambda: str(deep.deepcopy()) == deep_str),
+    ("simplify", lambda: str(deep.simplify()) == deep_str),
+    ("free", lambda: deep.free() == set()),
+    ("get_refs", lambda: deep.get_refs(True) == [Variable("x")]),
+    ("replace", lambda: str(deep.replace(Variable("x"), DrtVariableExpression(Variable("y")), True)) ==
+        deep_str.replace("x", "y")),
+    ("readings", lambda: deep.readings() is None),
+    ("resolve", lambda: [str(reading) for reading in discourse.resolve()[0]] == [resolved_str]),
+    ]
+    tester.output_test([(number, name, True) for number, (name, check) in enumerate(checks, 1)],
+                       lambda name: dict(checks)[name]())
+
+class NegatedSubclass(DrtNegatedExpression):
+    """A negation that nltk takes to be equal to a DrtNegatedExpression"""
+    pass
+
+def test_equality(tester):
+    parse = tester.presupp_parser.parse
+    walk = parse("([e],[walk(e)])")
+
+    #equal expressions have equal hashes, whatever subclasses they are made of
+    checks = [
+    ("subclass", lambda: DrtNegatedExpression(walk) == NegatedSubclass(walk) and
+        NegatedSubclass(walk) == DrtNegatedExpression(walk)),
+    ("subclass in DRS", lambda: DRS([], [DrtNegatedExpression(walk)]) == DRS([], [NegatedSubclass(walk)])),
+    ("subclass hash", lambda: hash(DrtNegatedExpression(walk)) == hash(NegatedSubclass(walk))),
+    ]
+
+    #implications are equal up to the names of their referents, but not up to
+    #the order of their conditions, which only their canonical keys ignore
+    implication = parse("(([x],[farmer(x), old(x)]) -> ([y],[donkey(y), own(x,y)]))")
+    renamed = parse("(([z],[farmer(z), old(z)]) -> ([u],[donkey(u), own(z,u)]))")
+    reordered = parse("(([x],[old(x), farmer(x)]) -> ([y],[own(x,y), donkey(y)]))")
+    checks += [
+    ("implication renamed", lambda: implication == renamed),
+    ("implication reordered", lambda: not implication == reordered),
+    ("implication reordered key", lambda: implication.canonical_key() == reordered.canonical_key()),
+    ]
+    tester.output_test([(number, name, True) for number, (name, check) in enumerate(checks, 1)],
+                       lambda name: dict(checks)[name]())
+
+def test_utilities(tester):
+    parse = tester.presupp_parser.parse
+
+    #sentences are split into the words the patterns tried one after another gave
+    cases_split = [
+    (1, "Jones's wife has not bought someone's car", ["Jones", "s", "wife", "has", "not", "bought", "someone's", "car"]),
+
+    (2, "Mary kissed John, he smiled", ["Mary", "did", "kiss", "John", "he", "did", "smile"]),
+
+    (3, "Every farmer who owns a donkey wrote everything he wanted", ["Every", "farmer", "who", "does", "own", "a", "donkey", "did", "write", "every", "thing", "he", "did", "want"]),
+
+    (4, "Angus bit the dog and died", ["Angus", "did", "bite", "the", "dog", "and", "did", "die"]),
+
+    (5, "If Jones is away, he has left London", ["If", "Jones", "is", "away", "he", "has", "left", "London"]),
+
+    (6, "The baroness likes his red car", ["The", "baroness", "does", "like", "his", "red", "car"]),
+
+    (7, "Bill walked,Jones talked", ["Bill", "did", "walk", "Jones", "did", "talk"]),
+
+    (8, "He hates himself", ["He", "does", "hate", "himself"]),
+    ]
+    tester.output_test(cases_split, Tokenizer().split)
+
+    #the readings are decoded as they were encoded
+    readings = [(number, drs, drs) for number, drs in enumerate(expected_readings(), 1)]
+    tester.output_test(readings, lambda drs: serialize.loads(serialize.dumps(parse(drs))))
+
+    #a full cache drops the sentence that was used least recently
+    def evicted():
+        cache = SentenceCache(2)
+        drs = parse("([x],[walk(x)])")
+        cache.put(["a"], drs)
+        cache.put(["b"], drs)
+        cache.get(["a"])
+        cache.put(["c"], drs)
+        kept = [cache.get([word]) is not None for word in "abc"]
+        return kept == [True, False, True] and tuple(cache.info()) == (3, 1, 2, 2)
+
+    def disabled():
+        cache = SentenceCache(0)
+        cache.put(["a"], parse("([x],[walk(x)])"))
+        return cache.get(["a"]) is None
+
+    #allocators with different namespaces never give out the same name, and
+    #one with a namespace gives out the same names whenever it starts afresh
+    def separated():
+        numbers = []
+        for namespace in (1, 9, 10, 11, 82, None):
+            allocator = VariableAllocator(namespace)
+            numbers.extend(allocator.number() for i in range(200))
+        return len(set(numbers)) == len(numbers)
+
+    def repeated():
+        names = []
+        for i in range(2):
+            with VariableAllocator(5):
+                names.append([unique_variable().name for j in range(3)])
+        return names[0] == names[1]
+
+    #a batch keeps the order of its discourses and reports the failed ones
+    texts = ["Mary likes John.", "Blorp frobs.", "Jones owns a car. He likes it.", "If Mary is away, she left London."]
+    def batch_records(processes):
+        results = list(batch.parse_batch(texts, temporaldrt.DrtParser, processes=processes, window=2))
+        stream = StringIO()
+        batch.write_jsonl(results, stream)
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        return ([text for text, drs, error in results] == texts and
+                [drs is None for text, drs, error in results] == [False, True, False, True] and
+                [(record['id'], 'error' in record) for record in records] == list(enumerate([False, True, False, True])))
+
+    checks = [
+    ("cache eviction", evicted),
+    ("cache disabled", disabled),
+    ("allocator namespaces", separated),
+    ("allocator repeated", repeated),
+    ("batch in this process", lambda: batch_records(0)),
+    ("batch in worker processes", lambda: batch_records(2)),
+    ]
+    tester.output_test([(number, name, True) for number, (name, check) in enumerate(checks, 1)],
+                       lambda name: dict(checks)[name]())
+
 HASH_LINE = "#"*80
 
 def print_header(header):
@@ -247,7 +472,10 @@ def print_header(header):
 TESTS = [("Anaphora Component", test_anaphora),
          ("Presupposition Component", test_presupposition),
          ("Inference Component ", test_inference),
-         ("Tempotal Component", test_tenses)
+         ("Tempotal Component", test_tenses),
+         ("Traversal Component", test_traversals),
+         ("Equality Component", test_equality),
+         ("Utility Component", test_utilities)
          ]
 def main():
     tester = Tester('file:../data/grammar.fcfg', DrtParser)
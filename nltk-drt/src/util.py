@@ -5,17 +5,484 @@ __author__ = "Alex Kislev, Emma Li, Peter Makarov"
 __version__ = "1.0"
 __date__ = "Tue, 24 Aug 2010"
 
+import os
 import re
-from nltk import load_parser
+import sys
+import heapq
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+from itertools import islice
+from multiprocessing.pool import ThreadPool
+import cPickle as pickle
+import nltk
+import serialize
+from nltk import load_parser, Tree
+from nltk.featstruct import TYPE, unify
+from nltk.grammar import FeatStructNonterminal, is_nonterminal, is_terminal
+from nltk.parse.chart import TreeEdge
+from nltk.parse.featurechart import FeatureTreeEdge
 from temporaldrt import DrtVariableExpression, unique_variable, NewInfoDRS
-from presuppdrt import ResolutionException, DrtParser as PresuppDrtParser
-from types import LambdaType
+from presuppdrt import ResolutionException, DiscourseBuilder, VariableAllocator, current_allocator, new_allocator, \
+    DrtParser as PresuppDrtParser
 from nltk.sem.logic import AndExpression, ParseException, LogicParser
-from inference import inference_check, get_bk, AdmissibilityError, ConsistencyError, InformativityError
+from inference import inference_check, consistency_check, get_bk, AdmissibilityError, ConsistencyError, InformativityError
 
 class UngrammaticalException(Exception):
     pass
 
+# bump whenever the pickled parser changes shape or the way it is built
+GRAMMAR_CACHE_VERSION = 2
+
+# the namespace of the unique variables in the semantics of a grammar; the
+# other allocators with namespace 0 throw the variables they give out away
+GRAMMAR_NAMESPACE = 0
+
+# the namespace of the unique variables made by Tester.output_test
+TEST_NAMESPACE = 1
+
+def _source_files(parser_class):
+    """Return the source files of the modules that the classes of a logic
+    parser are defined in, but for those of nltk, which are keyed by its version"""
+    files = []
+    for cls in parser_class.__mro__:
+        module = sys.modules[cls.__module__]
+        path = getattr(module, '__file__', None)
+        if path is None or module.__name__.split('.')[0] == 'nltk':
+            continue
+        if path.endswith(('.pyc', '.pyo')) and os.path.exists(path[:-1]):
+            path = path[:-1]
+        if path not in files:
+            files.append(path)
+    return files
+
+def user_cache_dir():
+    """Return the directory of the cache files of the user, after the XDG
+    convention: C{$XDG_CACHE_HOME/nltk-drt}, by default C{~/.cache/nltk-drt}"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'nltk-drt')
+
+def load_cached_parser(grammar, logic_parser, cache_dir=None):
+    """
+    Load a grammar like C{nltk.load_parser}, but keep the compiled parser,
+    with the semantics already parsed, in a cache file. The cache is keyed
+    by a hash of the grammar text, the logic parser, the sources of its
+    modules and the library versions, and rebuilt whenever the key changes.
+    It is written to a temporary file that is then renamed, so a process
+    never reads a cache that another one is still writing. The grammar is
+    built with an allocator of its own (see L{GRAMMAR_NAMESPACE}), so the
+    unique variables of the caller are numbered alike whether the cache is
+    used or not. Grammars that are not local files are loaded as usual.
+    @param grammar: C{str} URL of an C{.fcfg} grammar
+    @param logic_parser: C{DrtParser} for the semantics in the grammar
+    @param cache_dir: C{str} the directory of the cache file, by default
+    L{user_cache_dir}
+    @return: C{FeatureChartParser}
+    """
+    if not grammar.startswith('file:'):
+        return load_parser(grammar, logic_parser=logic_parser)
+    path = grammar[len('file:'):]
+    parser_class = logic_parser.__class__
+    key = hashlib.sha1()
+    sources = [open(source, 'rb').read() for source in _source_files(parser_class)]
+    for part in [open(path, 'rb').read(), parser_class.__module__, parser_class.__name__,
+                 nltk.__version__, serialize.MAGIC, str(GRAMMAR_CACHE_VERSION)] + sources:
+        key.update(part)
+        key.update('\0')
+    key = key.hexdigest()
+    # grammars of the same name in other directories get files of their own
+    location = hashlib.sha1(os.path.abspath(path)).hexdigest()[:12]
+    cache = os.path.join(cache_dir or user_cache_dir(), "%s.%s.%s.cache" %
+                         (os.path.basename(path), location, parser_class.__module__))
+
+    # the key is pickled separately, so a stale parser is never unpickled
+    try:
+        with open(cache, 'rb') as stream:
+            if pickle.load(stream) == key:
+                return pickle.load(stream)
+    except Exception:
+        # missing, or written by an incompatible version of the code
+        pass
+
+    # not from the resource cache, which may hold semantics of another parser
+    with VariableAllocator(GRAMMAR_NAMESPACE):
+        parser = load_parser(grammar, logic_parser=logic_parser, cache=False)
+    temp = None
+    try:
+        directory = os.path.dirname(cache)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # a file of its own in the same directory, so that the rename is atomic
+        descriptor, temp = tempfile.mkstemp(prefix=os.path.basename(cache) + '.', dir=directory)
+        with os.fdopen(descriptor, 'wb') as stream:
+            pickle.dump(key, stream, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(parser, stream, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp, cache)
+    except (IOError, OSError, pickle.PicklingError):
+        # a read-only location only costs the speed up
+        if temp is not None:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+    return parser
+
+def iter_parse(parser, tokens, grammar=None):
+    """
+    Parse lazily with a chart parser. Every complete tree is yielded as soon
+    as the chart has it, so a caller that needs only the first one does not
+    wait for the whole chart to be built or for all the trees to be read
+    off it. Once the chart is complete, the trees that were added to the
+    spanning edges after their first appearance follow. The loop building
+    the chart is that of C{ChartParser.chart_parse} in nltk 2.0b9, and uses
+    the private attributes of the parser of that version.
+    @param parser: C{ChartParser}, e.g. the C{FeatureChartParser} of an C{.fcfg} grammar
+    @param tokens: C{list} of C{str}
+    @param grammar: C{ContextFreeGrammar} to parse with in place of the
+    grammar of the parser, e.g. one made by L{GrammarPruner}
+    @return: iterator over C{Tree}
+    """
+    tokens = list(tokens)
+    # the words are covered or not by the grammar of the parser as a whole
+    parser.grammar().check_coverage(tokens)
+    if grammar is None:
+        grammar = parser.grammar()
+    chart = parser._chart_class(tokens)
+    start = grammar.start()
+    # the spanning edges found so far, and the frozen trees yielded for each of them
+    found = []
+    yielded = {}
+
+    def spans(edge):
+        if (edge.start() != 0 or edge.end() != chart.num_leaves() or edge.is_incomplete() or
+            edge in yielded or not isinstance(edge, TreeEdge)):
+            return False
+        if isinstance(start, FeatStructNonterminal):
+            return (isinstance(edge, FeatureTreeEdge) and edge.lhs()[TYPE] == start[TYPE] and
+                    unify(edge.lhs(), start, rename_vars=True) is not None)
+        return edge.lhs() == start
+
+    def first_trees(edge):
+        found.append(edge)
+        trees = chart.trees(edge, complete=True, tree_class=Tree)
+        yielded[edge] = set(tree.freeze() for tree in trees)
+        return trees
+
+    for axiom in parser._axioms:
+        axiom.apply(chart, grammar)
+    for edge in chart.edges():
+        if spans(edge):
+            for tree in first_trees(edge):
+                yield tree
+
+    if parser._use_agenda:
+        # the agenda algorithm of ChartParser.chart_parse in nltk 2.0b9
+        agenda = chart.edges()
+        agenda.reverse()
+        while agenda:
+            edge = agenda.pop()
+            for rule in parser._inference_rules:
+                for new_edge in rule.apply_iter(chart, grammar, edge):
+                    agenda.append(new_edge)
+                    if spans(new_edge):
+                        for tree in first_trees(new_edge):
+                            yield tree
+    else:
+        edges_added = True
+        while edges_added:
+            edges_added = False
+            for rule in parser._strategy:
+                new_edges = rule.apply_everywhere(chart, grammar)
+                edges_added = len(new_edges)
+                for new_edge in new_edges:
+                    if spans(new_edge):
+                        for tree in first_trees(new_edge):
+                            yield tree
+
+    for edge in found:
+        for tree in chart.trees(edge, complete=True, tree_class=Tree):
+            if tree.freeze() not in yielded[edge]:
+                yield tree
+
+class GrammarPruner(object):
+    """
+    Makes the grammar of a single sentence out of a large grammar: the
+    lexical productions of its words and the phrasal productions that can
+    be built from them and lead up to the start symbol. Productions are
+    told apart by the type of their categories, so a pruned production is
+    one that could never take part in a parse of the sentence. The lexical
+    productions are indexed by their words once, so that pruning costs
+    time in the length of the sentence and the number of phrasal
+    productions, but not in the size of the lexicon.
+    """
+    def __init__(self, grammar):
+        """
+        @param grammar: C{ContextFreeGrammar}, e.g. the C{FeatureGrammar} of an C{.fcfg} grammar
+        """
+        self.grammar = grammar
+        self._start = self._type(grammar.start())
+        # productions are kept with their positions, so that the productions
+        # of a pruned grammar are in the order of the grammar
+        self._lexical = {}
+        self._phrasal = []
+        # categories whose type is a variable might match any other one
+        self._prunable = all(isinstance(self._type(category), basestring) for production in grammar.productions()
+                             for category in (production.lhs(),) + tuple(production.rhs()) if is_nonterminal(category))
+        for position, production in enumerate(grammar.productions()):
+            categories = set(self._type(item) for item in production.rhs() if is_nonterminal(item))
+            words = frozenset(item for item in production.rhs() if is_terminal(item))
+            entry = (position, production, self._type(production.lhs()), categories, words)
+            if words and not categories:
+                for word in words:
+                    self._lexical.setdefault(word, []).append(entry)
+            else:
+                self._phrasal.append(entry)
+
+    @staticmethod
+    def _type(category):
+        if isinstance(category, FeatStructNonterminal):
+            return category.get(TYPE, category)
+        return category
+
+    def prune(self, tokens):
+        """
+        @param tokens: C{list} of C{str}
+        @return: C{ContextFreeGrammar} of the same class as the grammar, with its start symbol
+        """
+        if not self._prunable:
+            return self.grammar
+        tokens = set(tokens)
+        entries = {}
+        built = set()
+        for token in tokens:
+            for entry in self._lexical.get(token, ()):
+                if entry[4] <= tokens:
+                    entries[entry[0]] = entry
+                    built.add(entry[2])
+        # the categories that can be built bottom up from the words
+        phrasal = [entry for entry in self._phrasal if entry[4] <= tokens]
+        while phrasal:
+            remaining = []
+            for entry in phrasal:
+                if entry[3] <= built:
+                    entries[entry[0]] = entry
+                    built.add(entry[2])
+                else:
+                    remaining.append(entry)
+            if len(remaining) == len(phrasal):
+                break
+            phrasal = remaining
+        # of which only those that lead up to the start symbol are needed
+        expanding = {}
+        for entry in entries.itervalues():
+            expanding.setdefault(entry[2], []).append(entry)
+        reached = set([self._start])
+        agenda = [self._start]
+        while agenda:
+            for entry in expanding.get(agenda.pop(), ()):
+                for category in entry[3] - reached:
+                    reached.add(category)
+                    agenda.append(category)
+        productions = [entry[1] for position, entry in sorted(entries.iteritems()) if entry[2] in reached]
+        if not productions:
+            # nothing can be built from the words: the whole grammar fails on
+            # them with the error of the parser rather than of an empty grammar
+            return self.grammar
+        return self.grammar.__class__(self.grammar.start(), productions)
+
+def best_combinations(sizes, n):
+    """
+    Generate the index tuples into sequences of the given sizes, by
+    increasing sum of the indices, i.e. the combinations of the best
+    choices first. Among those with the same sum, the ones that differ
+    from the best choices further to the end come first.
+    @param sizes: C{list} of C{int} > 0
+    @param n: C{int} the number of combinations to generate at most
+    @return: iterator over C{tuple} of C{int}
+    """
+    first = (0,) * len(sizes)
+    agenda = [(0, first)]
+    seen = set([first])
+    while agenda and n > 0:
+        total, combination = heapq.heappop(agenda)
+        yield combination
+        n -= 1
+        for position, size in enumerate(sizes):
+            if combination[position] + 1 < size:
+                successor = combination[:position] + (combination[position] + 1,) + combination[position + 1:]
+                if successor not in seen:
+                    seen.add(successor)
+                    heapq.heappush(agenda, (total + 1, successor))
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+class SentenceCache(object):
+    """
+    Least recently used cache of the DRSs of sentences, keyed by their tokens.
+    Every hit is a copy with fresh referents, so that a sentence that occurs
+    several times in a discourse never shares referents with itself. The
+    cache keeps copies of its own, as a DRS can be changed in place.
+    """
+    def __init__(self, maxsize=256):
+        """
+        @param maxsize: C{int} the number of sentences to keep, 0 disables the cache
+        """
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, words):
+        """
+        @param words: C{list} of C{str}
+        @return: C{AbstractDrs} a renamed copy of the cached DRS, or C{None}
+        """
+        key = tuple(words)
+        with self._lock:
+            drs = self._entries.pop(key, None)
+            if drs is None:
+                self.misses += 1
+                return None
+            self._entries[key] = drs
+            self.hits += 1
+        refs = set(drs.get_refs(True))
+        if not refs:
+            return drs.deepcopy()
+        # replacing every referent rebuilds every part of the DRS
+        return drs.substitute(dict((ref, DrtVariableExpression(unique_variable(ref))) for ref in refs), True)
+
+    def put(self, words, drs):
+        """
+        @param words: C{list} of C{str}
+        @param drs: C{AbstractDrs} of the sentence, of which a copy is kept
+        """
+        if self.maxsize <= 0:
+            return
+        key = tuple(words)
+        drs = drs.deepcopy()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = drs
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def info(self):
+        """@return: C{CacheInfo} the hit statistics and the size of the cache"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+class Tokenizer(object):
+    """
+    Splits sentences into the words of the grammar: inflected verbs into the
+    auxiliary and the stem, possessives and words like 'someone' into their
+    parts. The regular forms are recognized by a single combined pattern and
+    the irregular ones are looked up in a dictionary, which can be extended
+    from data. The analysis of a word is remembered, so that after its first
+    occurrence a word costs a dictionary lookup.
+    """
+    WORD_SPLIT = re.compile(" |, |,")
+    EXCLUDED_NEXT = re.compile("^ha[sd]|is|was|not|will$")
+    EXCLUDED = re.compile("^does|h?is|red|[a-z]+ness$")
+    # the alternatives are tried in order, the first one that matches wins
+    REGULAR = re.compile("^(?:(?P<possessive>[A-Z][a-z]+)'s?$"
+                         "|(?P<present>[a-z]+)s$"
+                         "|(?P<past>[a-z]+(?:[^cvklt]|lk|nt))ed|(?P<past_e>[a-z]+[cvlkt]e)d$"
+                         "|(?P<one>[A-Z]?[a-z]+)one$"
+                         "|(?P<thing>[A-Z]?[a-z]+)thing$)")
+    REGULAR_FORMS = {
+     'possessive' : lambda stem: (stem, "s"),
+     'present' : lambda stem: ("does", stem),
+     'past' : lambda stem: ("did", stem),
+     'past_e' : lambda stem: ("did", stem),
+     'one' : lambda stem: (stem, "one"),
+     'thing' : lambda stem: (stem, "thing"),
+    }
+    IRREGULAR = {
+     "died" : ("did", "die"),
+     "bit" : ("did", "bite"),
+     "bought" : ("did", "buy"),
+     "wrote" : ("did", "write"),
+    }
+    # the number of analysed words to remember at most
+    MAX_WORDS = 10000
+
+    def __init__(self, irregular=None):
+        """
+        @param irregular: C{dict} from irregular forms to the words they stand for,
+        in addition to L{IRREGULAR}
+        """
+        self.irregular = dict(Tokenizer.IRREGULAR)
+        self._words = {}
+        if irregular:
+            self.add_irregular(irregular)
+
+    def add_irregular(self, irregular):
+        """
+        @param irregular: C{dict} from irregular forms to sequences of the words they stand for
+        """
+        for form, words in irregular.iteritems():
+            self.irregular[form] = tuple(words)
+        self._words.clear()
+
+    def load_irregular(self, lines):
+        """
+        Add irregular forms from lines like 'bought did buy': the form followed
+        by the words it stands for. Empty lines and lines starting with '#' are skipped.
+        @param lines: iterable of C{str}, e.g. an open file
+        """
+        irregular = {}
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                words = line.split()
+                irregular[words[0]] = words[1:]
+        self.add_irregular(irregular)
+
+    def _analyse(self, word):
+        """Return whether the word excludes the next one from splitting, and its parts"""
+        if Tokenizer.EXCLUDED_NEXT.match(word):
+            analysis = (True, (word,))
+        elif Tokenizer.EXCLUDED.match(word):
+            analysis = (False, (word,))
+        elif word in self.irregular:
+            analysis = (False, self.irregular[word])
+        else:
+            match = Tokenizer.REGULAR.match(word)
+            if match:
+                analysis = (False, Tokenizer.REGULAR_FORMS[match.lastgroup](match.group(match.lastgroup)))
+            else:
+                analysis = (False, (word,))
+        if len(self._words) >= Tokenizer.MAX_WORDS:
+            self._words.clear()
+        self._words[word] = analysis
+        return analysis
+
+    def split(self, sentence):
+        """
+        @param sentence: C{str}
+        @return: C{list} of C{str}
+        """
+        words = []
+        analysed = self._words
+        exclude_next = False
+        for word in Tokenizer.WORD_SPLIT.split(sentence):
+            analysis = analysed.get(word) or self._analyse(word)
+            if analysis[0]:
+                exclude_next = True
+                words.append(word)
+            elif exclude_next:
+                exclude_next = False
+                words.append(word)
+            else:
+                words.extend(analysis[1])
+        return words
+
 class Tester(object):
     
     INFERROR = {
@@ -24,85 +491,162 @@ class Tester(object):
     1 : ConsistencyError           
     }
     
-    WORD_SPLIT = re.compile(" |, |,")
-    EXCLUDED_NEXT = re.compile("^ha[sd]|is|was|not|will$")
-    EXCLUDED = re.compile("^does|h?is|red|[a-z]+ness$")
-    SUBSTITUTIONS = [
-     (re.compile("^died$"), ("did", "die")),
-     (re.compile("^([A-Z][a-z]+)'s?$"), lambda m: (m.group(1), "s")),
-     (re.compile("^(?P<stem>[a-z]+)s$"), lambda m: ("does", m.group("stem"))),
-     (re.compile("^([a-z]+(?:[^cvklt]|lk|nt))ed|([a-z]+[cvlkt]e)d$"), lambda m: ("did", m.group(1) if m.group(1) else m.group(2))),
-     (re.compile("^([A-Z]?[a-z]+)one$"), lambda m: (m.group(1), "one")),
-     (re.compile("^([A-Z]?[a-z]+)thing$"), lambda m: (m.group(1), "thing")),
-     (re.compile("^bit$"), ("did", "bite")),
-     (re.compile("^bought$"), ("did", "buy")),
-     (re.compile("^wrote$"), ("did", "write")),
-    ]
-    
-    def __init__(self, grammar, drt_parser):
+    def __init__(self, grammar, drt_parser, allocator=None, cache_size=256, prune=False, cache_dir=None):
+        """
+        @param allocator: C{VariableAllocator} for the unique variables made
+        while parsing and resolving, by default the current one of the caller
+        @param cache_size: C{int} the number of parsed sentences to keep, 0 disables the cache
+        @param prune: C{bool} whether every sentence is parsed with the part of the
+        grammar it can use (see L{GrammarPruner}) rather than the whole grammar;
+        off by default
+        @param cache_dir: C{str} the directory of the compiled grammar (see
+        L{load_cached_parser}), by default L{user_cache_dir}
+        """
         assert isinstance(grammar, str) and grammar.endswith('.fcfg'), \
                             "%s is not a grammar name" % grammar
+        self.allocator = allocator
         self.drt_parser = drt_parser()
         self.presupp_parser = PresuppDrtParser()
         self.logic_parser = LogicParser()
-        self.parser = load_parser(grammar, logic_parser=self.drt_parser) 
+        self.parser = load_cached_parser(grammar, self.drt_parser, cache_dir)
+        self.pruner = prune and GrammarPruner(self.parser.grammar()) or None
+        self.cache = SentenceCache(cache_size)
+        self.tokenizer = Tokenizer()
+
+    def allocation(self):
+        """Return the allocator to use in a C{with} block"""
+        return self.allocator or current_allocator()
 
     def _split(self, sentence):
-        words = []
-        exlude_next = False
-        for word in Tester.WORD_SPLIT.split(sentence):
-            match = None
-            if Tester.EXCLUDED_NEXT.match(word):
-                exlude_next = True
-                words.append(word)
-                continue
-            if exlude_next or Tester.EXCLUDED.match(word):
-                exlude_next = False
-                words.append(word)
-                continue
-            for pattern, replacement in Tester.SUBSTITUTIONS:
-                match = pattern.match(word)
-                if match:
-                    if isinstance(replacement, LambdaType):
-                        words.extend(replacement(match))
-                    else:
-                        words.extend(replacement)
-                    break
-
-            if not match:
-                words.append(word)
+        return self.tokenizer.split(sentence)
 
-        return words
+    def trees(self, words, n=None):
+        """
+        Parse a tokenized sentence, building the chart only as far as needed.
+        @param words: C{list} of C{str} as returned by L{_split}
+        @param n: C{int} the number of trees to keep at most, or C{None} for all of them
+        @return: C{list} of C{Tree}
+        """
+        return list(islice(self._iter_trees(words), n))
+
+    def _iter_trees(self, words):
+        grammar = self.pruner and self.pruner.prune(words)
+        return iter_parse(self.parser, words, grammar)
 
     def parse(self, text, **args):
-        sentences = text.split('.')
+        with self.allocation():
+            return self._parse(text, **args)
+
+    def _parse(self, text, **args):
         utter = args.get("utter", True)
         verbose = args.get("verbose", False)
-        drs = (utter and self.drt_parser.parse('DRS([n],[])')) or []
-        
-        for sentence in sentences:
-            sentence = sentence.lstrip()
-            if sentence:
-                words = self._split(sentence)
-                if verbose:
-                    print words
-                trees = self.parser.nbest_parse(words)
-                try:
-                    new_drs = trees[0].node['SEM'].simplify()
-                except IndexError:
-                    raise UngrammaticalException()
-                if verbose:
-                    print(new_drs)
-                if drs:
-                    drs = (drs + new_drs).simplify()
-                else:
-                    drs = new_drs
+        discourse = self.discourse(utter)
+        for sentence in self.sentences(text):
+            discourse.append(self._parse_sentence(sentence, verbose))
     
+        drs = discourse.drs() or []
         if verbose:
             print drs
         return drs
 
+    @staticmethod
+    def sentences(text):
+        """Return the sentences of a text, in the way L{parse} splits it"""
+        return [sentence.lstrip() for sentence in text.split('.') if sentence.lstrip()]
+
+    def parse_alternatives(self, text, n, utter=True):
+        """
+        Parse a text into the DRSs of its C{n} best combinations of parse
+        trees, one tree for each sentence; the best combination is that of
+        the first trees, as L{parse} takes them. Trees whose DRSs only
+        differ in the names of their referents count once. Combinations
+        that begin with the same trees share the discourse built so far.
+        @param text: C{str}
+        @param n: C{int} the number of trees to take for every sentence and
+        the number of DRSs to return at most
+        @return: C{list} of C{AbstractDrs}, best first
+        """
+        with self.allocation():
+            return self._parse_alternatives(text, n, utter)
+
+    def _parse_alternatives(self, text, n, utter):
+        choices = [self._sentence_alternatives(sentence, n) for sentence in self.sentences(text)]
+        # the discourses built so far, by the indices of the trees of their sentences
+        builders = {(): self.discourse(utter)}
+        drss = []
+        for combination in best_combinations([len(alternatives) for alternatives in choices], n):
+            for end in range(1, len(combination) + 1):
+                prefix = combination[:end]
+                if prefix not in builders:
+                    builder = builders[prefix[:-1]].copy()
+                    builder.append(choices[end - 1][prefix[-1]])
+                    builders[prefix] = builder
+            drss.append(builders[combination].drs() or [])
+        return drss
+
+    def _sentence_alternatives(self, sentence, n):
+        words = self._split(sentence)
+        best = self.cache.get(words)
+        if best is not None and n == 1:
+            return [best]
+        # the sentence is parsed once: the best alternative is the DRS of the
+        # first tree, made before the chart is built any further, as parse()
+        # makes it; the other trees are read off the same chart
+        trees = islice(self._iter_trees(words), n)
+        first = next(trees, None)
+        if best is None:
+            if first is None:
+                raise UngrammaticalException()
+            best = first.node['SEM'].simplify()
+            self.cache.put(words, best)
+        drss = [best]
+        seen = set([best.canonical_key()])
+        for tree in trees:
+            drs = tree.node['SEM'].simplify()
+            key = drs.canonical_key()
+            if key not in seen:
+                seen.add(key)
+                drss.append(drs)
+        return drss
+
+    def discourse(self, utter=True):
+        """
+        Return a builder for the discourse of a text, to which the DRSs of
+        its sentences are appended in order.
+        @return: C{DiscourseBuilder}
+        """
+        return DiscourseBuilder(utter and self.drt_parser.parse('DRS([n],[])') or None)
+
+    def parse_sentence(self, sentence, verbose=False):
+        """
+        Parse a single sentence into its DRS.
+        @param sentence: C{str} without the full stop
+        @return: C{AbstractDrs}
+        """
+        with self.allocation():
+            return self._parse_sentence(sentence, verbose)
+
+    def _parse_sentence(self, sentence, verbose):
+        words = self._split(sentence)
+        if verbose:
+            print words
+        new_drs = self.cache.get(words)
+        if new_drs is None:
+            trees = self.trees(words, 1)
+            try:
+                new_drs = trees[0].node['SEM'].simplify()
+            except IndexError:
+                raise UngrammaticalException()
+            self.cache.put(words, new_drs)
+        if verbose:
+            print(new_drs)
+        return new_drs
+
     def test(self, cases, **args):
+        with self.allocation():
+            self._test(cases, **args)
+
+    def _test(self, cases, **args):
         verbose = args.get("verbose", False)
         for number, sentence, expected in cases:
             expected_drs = []
@@ -128,12 +672,38 @@ class Tester(object):
                 else:
                     print("%s. !!!unexpected error!!!\n%s\n%s" % (number, sentence, e))
 
-    def interpret(self, expr_1, expr_2, background=None, verbose=False, test=False):
+    def output_test(self, cases, output):
+        """
+        Check the outputs of a function, e.g. the first order translations of
+        DRSs. The unique variables made for every case are numbered afresh
+        (see L{TEST_NAMESPACE}), so that they are the same in every run.
+        @param cases: C{list} of C{tuple}s of the number, the input and the
+        expected output or its string
+        @param output: C{function} from the input to the output
+        """
+        for number, text, expected in cases:
+            try:
+                with VariableAllocator(TEST_NAMESPACE):
+                    returned = output(text)
+                if returned == expected or str(returned) == expected:
+                    print("%s. %s -- Output: %s\n" % (number, text, returned))
+                else:
+                    print("%s. !!!failed output!!!\n\n%s\n\nExpected:\t%s\n\nReturns:\t%s\n" %
+                          (number, text, expected, returned))
+            except Exception as e:
+                print("%s. !!!unexpected error!!!\n%s\n%s" % (number, text, e))
+
+    def interpret(self, expr_1, expr_2, background=None, verbose=False, test=False, prune=False, trees=1,
+                  threads=None):
         """Interprets a new expression with respect to some previous discourse 
         and background knowledge. The function first generates relevant background
         knowledge and then performs inference check on readings generated by 
         the resolve() method. It returns a list of admissible interpretations in
-        the form of DRSs."""
+        the form of DRSs. With prune, partially resolved readings that are already
+        inconsistent are not resolved any further. With more than one tree, the
+        DRSs of the best combinations of parse trees of the new expression are
+        interpreted concurrently (see L{interpret_alternatives}) with the threads
+        given, one for each of them by default."""
         
         assert(not expr_1 or isinstance(expr_1, str)), "Expression %s is not a string" % expr_1
         assert(isinstance(expr_2, str)), "Expression %s is not a string" % expr_2
@@ -141,12 +711,22 @@ class Tester(object):
         try:
             if expr_1:
                 discourse = self.parse(expr_1, utter=True)
-                expression = self.parse_new(discourse, expr_2)          
+                if trees > 1:
+                    expressions = self.parse_new_alternatives(discourse, expr_2, trees)
+                else:
+                    expression = self.parse_new(discourse, expr_2)
             else:
                 discourse = None
-                expression = self.parse(expr_2, utter=True)
+                if trees > 1:
+                    expressions = self.parse_alternatives(expr_2, trees, utter=True)
+                else:
+                    expression = self.parse(expr_2, utter=True)
 
-            interpretations, errors = self.interpret_new(discourse, expression, background=background, verbose=verbose)
+            if trees > 1:
+                interpretations, errors = self.interpret_alternatives(discourse, expressions, background=background,
+                                                                      verbose=verbose, prune=prune, threads=threads)
+            else:
+                interpretations, errors = self.interpret_new(discourse, expression, background=background, verbose=verbose, prune=prune)
 
             if test:
                 return interpretations, errors
@@ -183,18 +763,91 @@ class Tester(object):
     def parse_new(self, discourse, expression_str):
         """parse the new expression and make sure that it has unique variables"""
         expression = self.parse(expression_str, utter=False)
-        for ref in set(expression.get_refs(True)) & set(discourse.get_refs(True)):
-            newref = DrtVariableExpression(unique_variable(ref))
-            expression = expression.replace(ref, newref, True)
-        return expression
+        with self.allocation():
+            return self._rename_apart(discourse, expression)
 
-    def interpret_new(self, discourse, expression, background=None, verbose=False):
+    def parse_new_alternatives(self, discourse, expression_str, n):
+        """like L{parse_new}, for the DRSs of L{parse_alternatives}"""
+        with self.allocation():
+            refs = set(discourse.get_refs(True))
+            return [self._rename_apart(discourse, expression, refs)
+                    for expression in self._parse_alternatives(expression_str, n, False)]
+
+    def _rename_apart(self, discourse, expression, refs=None):
+        if refs is None:
+            refs = set(discourse.get_refs(True))
+        return expression.substitute(dict((ref, DrtVariableExpression(unique_variable(ref)))
+            for ref in set(expression.get_refs(True)) & refs), True)
+
+    def interpret_new(self, discourse, expression, background=None, verbose=False, prune=False):
         """Interprets a new expression with respect to some previous discourse 
         and background knowledge. The function first generates relevant background
         knowledge and then performs inference check on readings generated by 
         the resolve() method. It returns a list of admissible interpretations in
         the form of DRSs."""
+        with self.allocation():
+            return self._interpret_new(discourse, expression, background, verbose, prune)
 
+    def interpret_alternatives(self, discourse, expressions, background=None, verbose=False, prune=False,
+                               threads=None):
+        """
+        Interpret the alternative DRSs of a new expression, e.g. those of
+        L{parse_alternatives}, each like L{interpret_new} and in a thread of
+        its own, so that the inference checks of the alternatives run at the
+        same time. Only the waiting for the theorem prover and the model
+        builder, which run as processes of their own, is done at the same
+        time: resolving the readings is python code, which the threads run
+        one at a time under the global interpreter lock. All of them
+        continue the same discourse, which is parsed only once. The results are merged in the order of the alternatives,
+        best first: an interpretation or an inadmissible reading that is
+        equal to one that comes before it is dropped. An alternative that
+        can not be resolved is left out, unless none of them can.
+        @param expressions: C{list} of C{AbstractDrs}, best first
+        @param threads: C{int} the number of threads, by default one per alternative
+        @return: C{tuple} of the admissible interpretations and the inadmissible
+        readings with their errors, like L{interpret_new}
+        """
+        # every alternative gets an allocator of its own, made in the order of
+        # the alternatives, so that the unique variables of its readings
+        # depend neither on the other alternatives nor on the threads
+        allocators = [new_allocator() for expression in expressions]
+        def interpret(alternative):
+            expression, allocator = alternative
+            with allocator:
+                try:
+                    return self._interpret_new(discourse, expression, background, verbose, prune)
+                except ResolutionException as e:
+                    return e
+        pool = ThreadPool(threads or len(expressions) or 1)
+        try:
+            results = pool.map(interpret, zip(expressions, allocators))
+        finally:
+            pool.close()
+            pool.join()
+        if results and all(isinstance(result, ResolutionException) for result in results):
+            raise results[0]
+
+        interpretations = []
+        errors = []
+        seen = set()
+        for result in results:
+            if result is None or isinstance(result, ResolutionException):
+                # either reported already or left out
+                continue
+            readings, failed = result
+            for reading in readings:
+                key = reading.canonical_key()
+                if key not in seen:
+                    seen.add(key)
+                    interpretations.append(reading)
+            for reading, error in failed:
+                key = reading.canonical_key()
+                if key not in seen:
+                    seen.add(key)
+                    errors.append((reading, error))
+        return interpretations, errors
+
+    def _interpret_new(self, discourse, expression, background, verbose, prune):
         try:
             if discourse:
                 new_discourse = (NewInfoDRS([], [expression]) + discourse).simplify()
@@ -206,7 +859,12 @@ class Tester(object):
             else:
                 background_knowledge = None
                     
-            return new_discourse.resolve(lambda x: inference_check(x, background_knowledge, verbose), verbose)
+            if prune:
+                partial_check = lambda x: consistency_check(x, background_knowledge, verbose)
+            else:
+                partial_check = None
+            return new_discourse.resolve(lambda x: inference_check(x, background_knowledge, verbose), verbose,
+                                         partial_check=partial_check)
             
         except IndexError:
             print "Input sentences only!"
@@ -10,6 +10,7 @@ import nltk
 from nltk.corpus.reader.wordnet import WordNetCorpusReader
 import temporaldrt as drt
 from temporaldrt import DrtTokens, DrtFeatureConstantExpression
+import serialize
 
 def singleton(cls):
     instance_container = []
@@ -65,6 +66,8 @@ class WordNetLookup(object):
 
 
 class DefiniteDescriptionDRS(drt.DefiniteDescriptionDRS):
+    __slots__ = ('wn',)
+
     def __init__(self, refs, conds):
         self.wn = WordNetLookup()
         super(drt.DefiniteDescriptionDRS, self).__init__(refs, conds)
@@ -118,12 +121,9 @@ class DefiniteDescriptionDRS(drt.DefiniteDescriptionDRS):
                         return True
             return False
 
+serialize.register(DefiniteDescriptionDRS, 100)
+
 class DrtParser(drt.DrtParser):
 
-    def handle_PresuppositionDRS(self, tok, context):
-        if tok == DrtTokens.DEFINITE_DESCRIPTION_DRS:
-            self.assertNextToken(DrtTokens.OPEN)
-            drs = self.handle_DRS(tok, context)
-            return DefiniteDescriptionDRS(drs.refs, drs.conds)
-        else:
-            return drt.DrtParser.handle_PresuppositionDRS(self, tok, context)
\ No newline at end of file
+    PRESUPPOSITION_DRSS = dict(drt.DrtParser.PRESUPPOSITION_DRSS)
+    PRESUPPOSITION_DRSS[DrtTokens.DEFINITE_DESCRIPTION_DRS] = DefiniteDescriptionDRS
\ No newline at end of file